@@ -0,0 +1,200 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+
+class FakeZincSearch:
+    """
+    In-process stand-in for the ZincSearch endpoints used by storage/zincsearch.py.
+
+    Args:
+        latency: Seconds to sleep before answering every request
+        jitter: Extra random seconds added on top of latency
+        error_rate: Probability (0-1) of answering a bulk insert with a 500
+        keep_documents: Keep inserted records in memory so searches return them
+        seed: Seed for the latency and error injection
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        keep_documents: bool = False,
+        seed: int = 42,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.keep_documents = keep_documents
+        self.rng = random.Random(seed)
+
+        self.lock = threading.Lock()
+        self.mappings: Dict[str, dict] = {}
+        self.documents: Dict[str, List[dict]] = {}
+        self.bulk_requests = 0
+        self.bulk_errors = 0
+        self.records_received = 0
+        self.bytes_received = 0
+        self.first_insert_at: Optional[float] = None
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeZincSearch":
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self) -> "FakeZincSearch":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "bulk_requests": self.bulk_requests,
+                "bulk_errors": self.bulk_errors,
+                "records_received": self.records_received,
+                "bytes_received": self.bytes_received,
+                "first_insert_at": self.first_insert_at,
+            }
+
+    def _delay(self):
+        delay = self.latency
+        if self.jitter:
+            with self.lock:
+                delay += self.rng.uniform(0, self.jitter)
+
+        if delay > 0:
+            time.sleep(delay)
+
+    def _should_fail(self) -> bool:
+        if not self.error_rate:
+            return False
+
+        with self.lock:
+            return self.rng.random() < self.error_rate
+
+    def _bulk(self, body: dict, size: int):
+        index_name = body.get("index")
+        records = body.get("records", [])
+
+        with self.lock:
+            self.bulk_requests += 1
+            self.records_received += len(records)
+            self.bytes_received += size
+
+            if self.first_insert_at is None:
+                self.first_insert_at = time.time()
+
+            if self.keep_documents:
+                self.documents.setdefault(index_name, []).extend(records)
+
+        return {"message": "v2 data inserted", "record_count": len(records)}
+
+    def _search(self, index_name: str, body: dict):
+        start = time.time()
+        offset = body.get("from", 0)
+        size = body.get("size", 10)
+
+        filename = None
+        for clause in body.get("query", {}).get("bool", {}).get("must", []):
+            filename = clause.get("term", {}).get("filename", filename)
+
+        with self.lock:
+            documents = self.documents.get(index_name, [])
+            if filename:
+                documents = [d for d in documents if d.get("filename") == filename]
+
+            hits = [
+                {"_index": index_name, "_id": str(offset + i), "_source": doc}
+                for i, doc in enumerate(documents[offset:offset + size])
+            ]
+            total = len(documents)
+
+        return {
+            "took": int((time.time() - start) * 1000),
+            "hits": {"total": {"value": total}, "hits": hits},
+        }
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _read_json(self):
+                length = int(self.headers.get("Content-Length", 0))
+                raw = self.rfile.read(length) if length else b"{}"
+                return json.loads(raw), length
+
+            def _reply(self, status: int, payload: dict):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                fake._delay()
+
+                parts = self.path.strip("/").split("/")
+                if len(parts) == 3 and parts[:2] == ["api", "index"]:
+                    with fake.lock:
+                        mapping = fake.mappings.get(parts[2])
+                    if mapping is None:
+                        return self._reply(404, {"error": "index does not exist"})
+                    return self._reply(200, mapping)
+
+                self._reply(404, {"error": "not found"})
+
+            def do_PUT(self):
+                body, _ = self._read_json()
+                fake._delay()
+
+                if self.path != "/api/index":
+                    return self._reply(404, {"error": "not found"})
+
+                with fake.lock:
+                    if body.get("name") in fake.mappings:
+                        return self._reply(400, {"error": "index already exists"})
+                    fake.mappings[body.get("name")] = body
+
+                self._reply(200, {"message": "ok", "index": body.get("name")})
+
+            def do_POST(self):
+                body, size = self._read_json()
+                fake._delay()
+
+                if self.path == "/api/_bulkv2":
+                    if fake._should_fail():
+                        with fake.lock:
+                            fake.bulk_errors += 1
+                        return self._reply(500, {"error": "injected failure"})
+
+                    return self._reply(200, fake._bulk(body, size))
+
+                parts = self.path.strip("/").split("/")
+                if len(parts) == 3 and parts[0] == "es" and parts[2] == "_search":
+                    return self._reply(200, fake._search(parts[1], body))
+
+                self._reply(404, {"error": "not found"})
+
+        return Handler
@@ -0,0 +1,229 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import resource
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from fastapi import UploadFile
+
+import storage.zincsearch as zincsearch
+from controllers import compare
+from controllers.suggest import suggestions
+from storage.backend import StorageBackend, set_backend
+from storage.sqlite import SQLiteBackend
+from storage.zincsearch import ZincSearchBackend
+from benchmarks.fake_zincsearch import FakeZincSearch
+from benchmarks.vcf_generator import generate_vcf
+from routers.index_router import INGEST_INDEX_NAME, index_file
+
+
+def percentiles(values: List[float], points=(50, 90, 95, 99)) -> Dict[str, float]:
+    if not values:
+        return {f"p{p}": None for p in points}
+
+    ordered = sorted(values)
+    result = {}
+    for p in points:
+        rank = max(0, min(len(ordered) - 1, round(p / 100 * len(ordered)) - 1))
+        result[f"p{p}"] = round(ordered[rank] * 1000, 3)
+
+    return result
+
+
+def peak_rss_mb() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and kilobytes on Linux
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(usage / divisor, 2)
+
+
+class BulkTimer:
+    """Wraps the backend's bulk_insert to record client side latencies"""
+
+    def __init__(self, backend: StorageBackend):
+        self.backend = backend
+        self.latencies: List[float] = []
+        self.failures = 0
+        self.first_call_at: Optional[float] = None
+        self.lock = threading.Lock()
+        self._original = None
+
+    def __enter__(self):
+        self._original = self.backend.bulk_insert
+
+        def timed_bulk_insert(*args, **kwargs):
+            with self.lock:
+                if self.first_call_at is None:
+                    self.first_call_at = time.time()
+
+            start = time.perf_counter()
+            try:
+                return self._original(*args, **kwargs)
+            except Exception:
+                with self.lock:
+                    self.failures += 1
+                raise
+            finally:
+                with self.lock:
+                    self.latencies.append(time.perf_counter() - start)
+
+        self.backend.bulk_insert = timed_bulk_insert
+        return self
+
+    def __exit__(self, *exc):
+        del self.backend.bulk_insert
+
+
+async def run_ingest(path: Path, deadline: float, samples: Optional[str], columns: Optional[str]) -> dict:
+    with open(path, "rb") as handle:
+        upload = UploadFile(file=handle, filename=path.name)
+        return await asyncio.wait_for(
+            index_file(
+                file=upload,
+                samples=samples,
+                columns=columns,
+                profile=None,
+                x_profile=None,
+            ),
+            timeout=deadline,
+        )
+
+
+def run_queries(backend: StorageBackend, count: int) -> List[float]:
+    latencies = []
+    for i in range(count):
+        start = time.perf_counter()
+        backend.search(
+            # Same index the /api/index handler ingested into
+            index_name=INGEST_INDEX_NAME,
+            search_term="BRCA" if i % 2 else None,
+            page=1 + i % 5,
+            size=50,
+        )
+        latencies.append(time.perf_counter() - start)
+
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ADN browser ingestion benchmark")
+    parser.add_argument("--records", type=int, default=10_000)
+    parser.add_argument("--samples", type=int, default=1)
+    parser.add_argument("--info-fields", type=int, default=5)
+    parser.add_argument("--compressed", action="store_true", help="Use a BGZF input file")
+    parser.add_argument("--latency", type=float, default=0.0, help="Fake ZincSearch latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Bulk failure probability (0-1)")
+    parser.add_argument("--queries", type=int, default=20, help="Search requests to time after ingest")
+    parser.add_argument("--keep-documents", action="store_true", help="Keep inserted records for searches")
+    parser.add_argument("--deadline", type=float, default=600.0, help="Give up on the ingest after N seconds")
+    parser.add_argument("--keep-samples", type=int, help="Only ingest the first N samples")
+    parser.add_argument("--columns", help="Comma separated columns to keep, as in /api/index")
+    parser.add_argument("--backend", default="zincsearch", choices=["zincsearch", "sqlite"])
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        suffix = ".vcf.gz" if args.compressed else ".vcf"
+        vcf_path = generate_vcf(
+            Path(tmp) / f"benchmark{suffix}",
+            records=args.records,
+            samples=args.samples,
+            info_fields=args.info_fields,
+            compressed=args.compressed,
+        )
+        file_size = vcf_path.stat().st_size
+
+        fake = FakeZincSearch(
+            latency=args.latency,
+            jitter=args.jitter,
+            error_rate=args.error_rate,
+            keep_documents=args.keep_documents,
+        )
+
+        zincsearch.BASE_ENDPOINT = fake.url
+        # Keep the comparison keys and suggestions of the run away from the API server's
+        compare.KEYS_DIR = Path(tmp) / "keys"
+        suggestions.directory = Path(tmp) / "suggest"
+        if args.backend == "sqlite":
+            backend = SQLiteBackend(str(Path(tmp) / "benchmark.db"))
+        else:
+            backend = ZincSearchBackend()
+        set_backend(backend)
+
+        with fake, BulkTimer(backend) as bulk_timer:
+
+            start = time.time()
+            timed_out = False
+            try:
+                # The handler reports progress with print, keep stdout for the report
+                with contextlib.redirect_stdout(sys.stderr):
+                    samples = None
+                    if args.keep_samples is not None:
+                        samples = ",".join(f"SAMPLE{i}" for i in range(args.keep_samples))
+                    result = asyncio.run(run_ingest(vcf_path, args.deadline, samples, args.columns))
+            except asyncio.TimeoutError:
+                result = {"error": f"ingest did not finish within {args.deadline} seconds"}
+                timed_out = True
+            elapsed = time.time() - start
+
+            query_latencies = run_queries(backend, args.queries)
+            server_stats = fake.stats()
+
+    processed = result.get("records_processed", 0)
+    # Measured on the client so it works whatever the backend
+    first_insert_at = bulk_timer.first_call_at
+
+    report = {
+        "input": {
+            "records": args.records,
+            "samples": args.samples,
+            "info_fields": args.info_fields,
+            "compressed": args.compressed,
+            "file_bytes": file_size,
+            "keep_samples": args.keep_samples,
+            "columns": args.columns,
+        },
+        "backend": args.backend,
+        "fake_zincsearch": {
+            "latency": args.latency,
+            "jitter": args.jitter,
+            "error_rate": args.error_rate,
+        },
+        "status": result.get("status", "failed"),
+        "error": result.get("error"),
+        "timed_out": timed_out,
+        "elapsed_seconds": round(elapsed, 3),
+        "records_processed": processed,
+        "variants_per_second": round(processed / elapsed, 2) if elapsed else None,
+        "time_to_first_insert_seconds": round(first_insert_at - start, 3) if first_insert_at else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "bulk": {
+            "requests": len(bulk_timer.latencies),
+            "failures": bulk_timer.failures,
+            "records_received": server_stats["records_received"],
+            "bytes_sent": server_stats["bytes_received"],
+            "latency_ms": percentiles(bulk_timer.latencies),
+        },
+        "query": {
+            "requests": len(query_latencies),
+            "latency_ms": percentiles(query_latencies),
+        },
+    }
+
+    output = json.dumps(report, indent=2)
+    print(output)
+
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
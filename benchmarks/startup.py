@@ -0,0 +1,86 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+from benchmarks.fake_zincsearch import FakeZincSearch
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Run in a fresh interpreter every time, imports are cached once loaded
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import main
+elapsed = time.perf_counter() - start
+heavy = ["cyvcf2", "pika", "requests", "pyinstrument"]
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in heavy if m in sys.modules]}))
+"""
+
+LIFESPAN_SCRIPT = """
+import asyncio, json, time
+import main
+from storage.backend import get_backend
+
+async def run():
+    start = time.perf_counter()
+    async with main.lifespan(main.app):
+        ready = time.perf_counter() - start
+        first = time.perf_counter()
+        get_backend().search(main.index_router.QUERY_INDEX_NAME, page=1, size=10)
+        first_query = time.perf_counter() - first
+        report = main.readiness.report()
+    return {"seconds": ready, "first_query_seconds": first_query, "health": report}
+
+print(json.dumps(asyncio.run(run())))
+"""
+
+
+def run_script(script: str, env: dict) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=REPO_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # The app prints while starting up, the result is the last line
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ADN browser startup benchmark")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per measurement")
+    parser.add_argument("--latency", type=float, default=0.0, help="Fake ZincSearch latency in seconds")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+
+    args = parser.parse_args()
+
+    with FakeZincSearch(latency=args.latency) as fake:
+        env = {**os.environ, "ZINC_BASE_URL": fake.url, "STORAGE_BACKEND": "zincsearch"}
+
+        imports = [run_script(IMPORT_SCRIPT, env) for _ in range(args.runs)]
+        lifespans = [run_script(LIFESPAN_SCRIPT, env) for _ in range(args.runs)]
+
+    report = {
+        "runs": args.runs,
+        "import_main_ms": round(statistics.median(r["seconds"] for r in imports) * 1000, 3),
+        "heavy_modules_loaded_on_import": imports[-1]["loaded"],
+        "lifespan_startup_ms": round(statistics.median(r["seconds"] for r in lifespans) * 1000, 3),
+        "first_query_ms": round(statistics.median(r["first_query_seconds"] for r in lifespans) * 1000, 3),
+        "health": lifespans[-1]["health"],
+    }
+
+    output = json.dumps(report, indent=2)
+    print(output)
+
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+import argparse
+import random
+import struct
+import zlib
+from pathlib import Path
+from typing import IO, List
+
+CHROMOSOMES = [f"chr{i}" for i in range(1, 23)] + ["chrX", "chrY"]
+BASES = "ACGT"
+FILTERS = ["PASS", "PASS", "PASS", "q10", "LowQual"]
+GENES = ["BRCA1", "BRCA2", "TP53", "EGFR", "KRAS", "APOE", "CFTR", "MTHFR", "HBB", "LDLR"]
+
+# BGZF blocks hold at most 64KiB of uncompressed data, htslib uses 0xff00
+BGZF_BLOCK_SIZE = 0xFF00
+BGZF_EOF = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000")
+
+
+class BgzfWriter:
+    """Minimal BGZF writer so generated files can be read with threads by htslib"""
+
+    def __init__(self, handle: IO[bytes]):
+        self.handle = handle
+        self.buffer = bytearray()
+
+    def write(self, data: bytes):
+        self.buffer.extend(data)
+
+        while len(self.buffer) >= BGZF_BLOCK_SIZE:
+            self._write_block(bytes(self.buffer[:BGZF_BLOCK_SIZE]))
+            del self.buffer[:BGZF_BLOCK_SIZE]
+
+    def _write_block(self, block: bytes):
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+        compressed = compressor.compress(block) + compressor.flush()
+
+        # 18 bytes of header + compressed data + 8 bytes of footer, minus one
+        block_size = len(compressed) + 25
+
+        self.handle.write(
+            b"\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00"
+            + struct.pack("<H", block_size)
+        )
+        self.handle.write(compressed)
+        self.handle.write(struct.pack("<II", zlib.crc32(block), len(block)))
+
+    def close(self):
+        if self.buffer:
+            self._write_block(bytes(self.buffer))
+            self.buffer.clear()
+
+        self.handle.write(BGZF_EOF)
+
+
+def build_header(samples: List[str], info_fields: int) -> str:
+    lines = ["##fileformat=VCFv4.2", "##source=adn-browser-benchmark"]
+
+    for chrom in CHROMOSOMES:
+        lines.append(f"##contig=<ID={chrom}>")
+
+    lines.append('##FILTER=<ID=PASS,Description="All filters passed">')
+    lines.append('##FILTER=<ID=q10,Description="Quality below 10">')
+    lines.append('##FILTER=<ID=LowQual,Description="Low quality">')
+    lines.append('##INFO=<ID=GENE,Number=1,Type=String,Description="Gene symbol">')
+
+    for i in range(info_fields):
+        lines.append(f'##INFO=<ID=INF{i},Number=1,Type=Integer,Description="Synthetic field {i}">')
+
+    lines.append('##FORMAT=<ID=GT,Number=1,Type=String,Description="Genotype">')
+    lines.append('##FORMAT=<ID=DP,Number=1,Type=Integer,Description="Read depth">')
+
+    columns = ["#CHROM", "POS", "ID", "REF", "ALT", "QUAL", "FILTER", "INFO", "FORMAT"]
+    lines.append("\t".join(columns + samples))
+
+    return "\n".join(lines) + "\n"
+
+
+def build_record(rng: random.Random, chrom: str, pos: int, samples: int, info_fields: int) -> str:
+    ref = rng.choice(BASES)
+    alt = rng.choice(BASES.replace(ref, ""))
+
+    info = [f"GENE={rng.choice(GENES)}"]
+    info.extend(f"INF{i}={rng.randint(0, 1000)}" for i in range(info_fields))
+
+    genotypes = ["0/0", "0/1", "1/1"]
+    sample_values = [f"{rng.choice(genotypes)}:{rng.randint(1, 99)}" for _ in range(samples)]
+
+    fields = [
+        chrom,
+        str(pos),
+        f"rs{rng.randint(1, 10**8)}",
+        ref,
+        alt,
+        str(rng.randint(10, 99)),
+        rng.choice(FILTERS),
+        ";".join(info),
+        "GT:DP",
+    ]
+
+    return "\t".join(fields + sample_values) + "\n"
+
+
+def generate_vcf(
+    path: Path,
+    records: int,
+    samples: int = 1,
+    info_fields: int = 5,
+    compressed: bool = False,
+    seed: int = 42,
+) -> Path:
+    """
+    Write a synthetic, position sorted VCF file.
+
+    Args:
+        path: Destination path, a `.gz` suffix is expected when compressed
+        records: Number of variant records to write
+        samples: Number of sample columns
+        info_fields: Number of INFO key/value pairs per record besides GENE
+        compressed: Write BGZF compressed output instead of plain text
+        seed: Seed for the random generator, so runs are reproducible
+
+    Returns:
+        Path: The written file
+    """
+    rng = random.Random(seed)
+    sample_names = [f"SAMPLE{i}" for i in range(samples)]
+    per_chrom = max(1, records // len(CHROMOSOMES))
+
+    raw = open(path, "wb")
+    out = BgzfWriter(raw) if compressed else raw
+
+    try:
+        out.write(build_header(sample_names, info_fields).encode())
+
+        pos = 0
+        for i in range(records):
+            chrom = CHROMOSOMES[min(i // per_chrom, len(CHROMOSOMES) - 1)]
+            if i % per_chrom == 0 and i // per_chrom < len(CHROMOSOMES):
+                pos = 0
+
+            pos += rng.randint(1, 500)
+            out.write(build_record(rng, chrom, pos, samples, info_fields).encode())
+    finally:
+        if compressed:
+            out.close()
+        raw.close()
+
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic VCF generator")
+    parser.add_argument("output", help="Destination file")
+    parser.add_argument("--records", type=int, default=10_000)
+    parser.add_argument("--samples", type=int, default=1)
+    parser.add_argument("--info-fields", type=int, default=5)
+    parser.add_argument("--compressed", action="store_true", help="Write BGZF output")
+    parser.add_argument("--seed", type=int, default=42)
+
+    args = parser.parse_args()
+
+    generate_vcf(
+        Path(args.output),
+        records=args.records,
+        samples=args.samples,
+        info_fields=args.info_fields,
+        compressed=args.compressed,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    main()
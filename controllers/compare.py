@@ -0,0 +1,286 @@
+import hashlib
+import heapq
+import os
+import re
+import shutil
+import tempfile
+import uuid
+from pathlib import Path
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Set, TextIO, Tuple
+from urllib.parse import quote, unquote
+
+KEYS_DIR = Path(os.getenv("KEYS_DIR", Path(tempfile.gettempdir()) / "adn_keys"))
+KEYS_SUFFIX = ".tsv"
+
+OPERATIONS = ("intersect", "a_only", "b_only", "all")
+
+# Unsorted chromosomes are sorted in runs of this many keys, merged at most MERGE_FAN_IN at a time
+SORT_CHUNK_LINES = 200_000
+MERGE_FAN_IN = 32
+
+# (REF, ALT) of the variants sharing a position
+AlleleSet = Set[Tuple[str, str]]
+
+
+def keys_path(filename: str) -> Path:
+    # Filenames come from uploads and requests, hash them so "..", "." or
+    # separators can never point outside KEYS_DIR
+    digest = hashlib.sha256(filename.encode()).hexdigest()
+    return KEYS_DIR / digest
+
+
+def remove_tree(path: Path):
+    """rmtree that refuses to touch anything but a directory inside KEYS_DIR"""
+    if path.resolve().parent != KEYS_DIR.resolve():
+        raise ValueError(f"Refusing to remove {path}, it is not inside {KEYS_DIR}")
+
+    shutil.rmtree(path, ignore_errors=True)
+
+
+def chrom_sort_key(chrom: str):
+    # chr1, chr2, ..., chr10, chrX instead of the lexicographic chr1, chr10, chr2
+    name = re.sub(r"^chr", "", chrom, flags=re.IGNORECASE)
+    return (0, int(name), chrom) if name.isdigit() else (1, 0, chrom)
+
+
+def line_position(line: str) -> int:
+    return int(line.split("\t", 1)[0])
+
+
+def merge_runs(runs: List[Path], target: Path):
+    handles = [open(run) for run in runs]
+    try:
+        with open(target, "w") as out:
+            out.writelines(heapq.merge(*handles, key=line_position))
+    finally:
+        for handle in handles:
+            handle.close()
+
+    for run in runs:
+        run.unlink()
+
+
+def sort_keys_file(path: Path):
+    """
+    Sort a key file by position in place, with an external merge sort.
+
+    Only SORT_CHUNK_LINES keys are held in memory at a time, and at most
+    MERGE_FAN_IN files are open, however large the chromosome.
+    """
+    runs: List[Path] = []
+    with open(path) as handle:
+        while chunk := list(islice(handle, SORT_CHUNK_LINES)):
+            chunk.sort(key=line_position)
+            run = path.with_name(f"{path.name}.run{len(runs)}")
+            run.write_text("".join(chunk))
+            runs.append(run)
+
+    generation = 0
+    while len(runs) > MERGE_FAN_IN:
+        merged = []
+        for i in range(0, len(runs), MERGE_FAN_IN):
+            target = path.with_name(f"{path.name}.merge{generation}.{len(merged)}")
+            merge_runs(runs[i:i + MERGE_FAN_IN], target)
+            merged.append(target)
+        runs = merged
+        generation += 1
+
+    if runs:
+        merge_runs(runs, path)
+
+
+class KeyWriter:
+    """
+    Persists the (CHROM, POS, REF, ALT) keys of a file while it is ingested.
+
+    Keys are written to one file per chromosome, ordered by position, so two
+    files can be compared with a streaming merge. VCFs are normally sorted
+    already, chromosomes that are not get sorted when the writer is closed.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.staging = KEYS_DIR / f".{uuid.uuid4().hex}"
+        # Only the chromosome being written is open, assemblies can have thousands of contigs
+        self.handle: Optional[TextIO] = None
+        self.handle_chrom: Optional[str] = None
+        self.last_position: Dict[str, int] = {}
+        self.unsorted: Set[str] = set()
+
+    def key_file(self, chrom: str) -> Path:
+        return self.staging / f"{quote(chrom, safe='')}{KEYS_SUFFIX}"
+
+    def handle_for(self, chrom: str) -> TextIO:
+        if chrom != self.handle_chrom:
+            if self.handle is not None:
+                self.handle.close()
+
+            self.staging.mkdir(parents=True, exist_ok=True)
+            # A chromosome seen before only comes back in unsorted files, append to its keys
+            mode = "a" if chrom in self.last_position else "w"
+            self.handle = open(self.key_file(chrom), mode)
+            self.handle_chrom = chrom
+
+        return self.handle
+
+    def add(self, record: dict):
+        chrom = record.get("#CHROM")
+        position = record.get("POS")
+        if chrom is None or position is None:
+            return
+
+        position = int(position)
+
+        handle = self.handle_for(chrom)
+
+        if position < self.last_position.get(chrom, 0):
+            self.unsorted.add(chrom)
+        self.last_position[chrom] = position
+
+        ref = record.get("REF", "")
+        # One key per alternate allele so multi-allelic records match their split form
+        for alt in record.get("ALT", "").split(","):
+            handle.write(f"{position}\t{ref}\t{alt}\n")
+
+    def close_handle(self):
+        if self.handle is not None:
+            self.handle.close()
+            self.handle = None
+            self.handle_chrom = None
+
+    def close(self):
+        self.close_handle()
+
+        for chrom in self.unsorted:
+            sort_keys_file(self.key_file(chrom))
+
+        self.staging.mkdir(parents=True, exist_ok=True)
+
+        # Swap in the new keys so a re-ingest replaces the previous ones
+        target = keys_path(self.filename)
+        if target.exists():
+            remove_tree(target)
+        self.staging.rename(target)
+
+    def abort(self):
+        self.close_handle()
+
+        remove_tree(self.staging)
+
+
+def has_keys(filename: str) -> bool:
+    return keys_path(filename).is_dir()
+
+
+def remove_keys(filename: str):
+    remove_tree(keys_path(filename))
+
+
+def chromosomes(filename: str) -> List[str]:
+    return [
+        unquote(path.name[:-len(KEYS_SUFFIX)])
+        for path in keys_path(filename).glob(f"*{KEYS_SUFFIX}")
+    ]
+
+
+def read_groups(path: Optional[Path]) -> Iterator[Tuple[int, AlleleSet]]:
+    """Stream the keys of a chromosome as (position, alleles at that position)"""
+    if path is None or not path.exists():
+        return
+
+    current_position = None
+    alleles: AlleleSet = set()
+
+    with open(path) as handle:
+        for line in handle:
+            position, ref, alt = line.rstrip("\n").split("\t")
+            position = int(position)
+
+            if position != current_position:
+                if current_position is not None:
+                    yield current_position, alleles
+                current_position = position
+                alleles = set()
+
+            alleles.add((ref, alt))
+
+    if current_position is not None:
+        yield current_position, alleles
+
+
+def merge_chromosome(path_a: Optional[Path], path_b: Optional[Path]) -> Iterator[Tuple[int, str, str, str]]:
+    """Sorted merge of two key files, yielding (position, ref, alt, where) with where in a, b or both"""
+    groups_a = read_groups(path_a)
+    groups_b = read_groups(path_b)
+
+    group_a = next(groups_a, None)
+    group_b = next(groups_b, None)
+
+    while group_a is not None or group_b is not None:
+        if group_b is None or (group_a is not None and group_a[0] < group_b[0]):
+            for ref, alt in sorted(group_a[1]):
+                yield group_a[0], ref, alt, "a"
+            group_a = next(groups_a, None)
+        elif group_a is None or group_b[0] < group_a[0]:
+            for ref, alt in sorted(group_b[1]):
+                yield group_b[0], ref, alt, "b"
+            group_b = next(groups_b, None)
+        else:
+            position, alleles_a = group_a
+            alleles_b = group_b[1]
+            for ref, alt in sorted(alleles_a | alleles_b):
+                if (ref, alt) not in alleles_b:
+                    where = "a"
+                elif (ref, alt) not in alleles_a:
+                    where = "b"
+                else:
+                    where = "both"
+                yield position, ref, alt, where
+
+            group_a = next(groups_a, None)
+            group_b = next(groups_b, None)
+
+
+def compare_files(filename_a: str, filename_b: str, operation: str = "intersect") -> Iterator[dict]:
+    """
+    Compare the variants of two ingested files with a streaming merge of their keys.
+
+    Args:
+        filename_a: First file
+        filename_b: Second file
+        operation: intersect (in both files), a_only, b_only or all (every variant tagged with where it was found)
+
+    Returns:
+        Iterator of variant dicts, followed by a final {"summary": ...} dict with the counts
+    """
+    wanted = {
+        "intersect": {"both"},
+        "a_only": {"a"},
+        "b_only": {"b"},
+        "all": {"a", "b", "both"},
+    }[operation]
+
+    counts = {"both": 0, "a": 0, "b": 0}
+    chroms = sorted(set(chromosomes(filename_a)) | set(chromosomes(filename_b)), key=chrom_sort_key)
+
+    for chrom in chroms:
+        name = f"{quote(chrom, safe='')}{KEYS_SUFFIX}"
+
+        for position, ref, alt, where in merge_chromosome(
+            keys_path(filename_a) / name, keys_path(filename_b) / name
+        ):
+            counts[where] += 1
+            if where in wanted:
+                yield {"chrom": chrom, "pos": position, "ref": ref, "alt": alt, "in": where}
+
+    yield {
+        "summary": {
+            "a": filename_a,
+            "b": filename_b,
+            "operation": operation,
+            "shared": counts["both"],
+            "a_only": counts["a"],
+            "b_only": counts["b"],
+        }
+    }
@@ -1,11 +1,13 @@
-import pika
 import json
 import os
+import threading
 from typing import Any, Dict
 from dotenv import load_dotenv
 
 load_dotenv()
 
+CONNECT_TIMEOUT = float(os.getenv("RMQ_CONNECT_TIMEOUT", "5"))
+
 
 class Publisher:
     def __init__(self):
@@ -15,6 +17,38 @@ class Publisher:
         self.password = os.getenv("RMQ_PASS", "admin")
         self.queue_name = "event.drivent.email"
 
+        # Connection and channel are kept open between publishes, pika's
+        # blocking connection is not thread safe so access is serialised
+        self.lock = threading.Lock()
+        self.connection = None
+        self.channel = None
+
+    def connect(self) -> None:
+        """Open the connection and declare the queue, if not already done"""
+        # pika is imported here so starting the API doesn't pay for it
+        import pika
+
+        with self.lock:
+            if self.connection is not None and self.connection.is_open:
+                return
+
+            credentials = pika.PlainCredentials(self.user, self.password)
+            # Fail fast instead of hanging the startup warm-up on an unresponsive broker
+            parameters = pika.ConnectionParameters(
+                host=self.host,
+                port=self.port,
+                credentials=credentials,
+                connection_attempts=1,
+                socket_timeout=CONNECT_TIMEOUT,
+                stack_timeout=CONNECT_TIMEOUT,
+            )
+
+            self.connection = pika.BlockingConnection(parameters)
+            self.channel = self.connection.channel()
+
+            # Declare the queue (creates if doesn't exist)
+            self.channel.queue_declare(queue=self.queue_name, durable=True)
+
     def publish(self, message: Dict[str, Any]) -> None:
         """
         Publish a message to RabbitMQ queue
@@ -22,29 +56,48 @@ class Publisher:
         Args:
             message: Dictionary containing the message to be published
         """
-        credentials = pika.PlainCredentials(self.user, self.password)
-        parameters = pika.ConnectionParameters(
-            host=self.host, port=self.port, credentials=credentials
-        )
-        
-        connection = pika.BlockingConnection(parameters)
-        
-        channel = connection.channel()
-
-        # Declare the queue (creates if doesn't exist)
-        channel.queue_declare(queue=self.queue_name, durable=True)
+        import pika
 
         # Convert message to JSON string
         message_body = json.dumps(message)
 
-        # Publish the message
-        channel.basic_publish(
-            exchange="event.drivent.exchange",
-            routing_key="email",
-            body=message_body,
-            properties=pika.BasicProperties(
-                delivery_mode=1,
-            ),
-        )
-
-        connection.close()
+        # A pooled connection may have been dropped by the broker, reconnect once
+        for attempt in range(2):
+            self.connect()
+            try:
+                with self.lock:
+                    # Publish the message
+                    self.channel.basic_publish(
+                        exchange="event.drivent.exchange",
+                        routing_key="email",
+                        body=message_body,
+                        properties=pika.BasicProperties(
+                            delivery_mode=1,
+                        ),
+                    )
+                return
+            except (pika.exceptions.AMQPConnectionError, pika.exceptions.AMQPChannelError):
+                self.close()
+                if attempt == 1:
+                    raise
+
+    def close(self) -> None:
+        with self.lock:
+            if self.connection is not None and self.connection.is_open:
+                self.connection.close()
+
+            self.connection = None
+            self.channel = None
+
+
+_publisher = None
+
+
+def get_publisher() -> Publisher:
+    """Publisher shared by every request so the RabbitMQ connection is reused"""
+    global _publisher
+
+    if _publisher is None:
+        _publisher = Publisher()
+
+    return _publisher
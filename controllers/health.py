@@ -0,0 +1,83 @@
+import os
+import threading
+import time
+from typing import Callable, Dict, List
+
+from controllers.email import get_publisher
+from storage.backend import get_backend
+
+# /health checks storage again once the previous result is this old
+RECHECK_SECONDS = float(os.getenv("HEALTH_RECHECK_SECONDS", "5"))
+
+
+class Readiness:
+    """Results of the startup checks run by the app lifespan, reported by /health"""
+
+    def __init__(self):
+        self.checks: Dict[str, dict] = {}
+        self.startup_seconds = None
+        self.index_names: List[str] = []
+        self.storage_checked_at = 0.0
+        self.lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        # The queue only backs /api/email, the API is usable as long as storage is
+        return self.startup_seconds is not None and self.checks.get("storage", {}).get("ok", False)
+
+    def run(self, name: str, check: Callable[[], None]):
+        start = time.perf_counter()
+        try:
+            check()
+            self.checks[name] = {"ok": True}
+        except Exception as e:
+            print(f"Startup check {name} failed: {str(e)}")
+            self.checks[name] = {"ok": False, "error": str(e)}
+        finally:
+            self.checks[name]["seconds"] = round(time.perf_counter() - start, 3)
+
+    def check_storage(self):
+        backend = get_backend()
+        for index_name in self.index_names:
+            backend.ensure_index(index_name)
+
+    def warm_up(self, index_names: List[str]):
+        """Open the storage and RabbitMQ connections and check the indexes"""
+        start = time.perf_counter()
+
+        self.index_names = list(index_names)
+        self.run("storage", self.check_storage)
+        self.storage_checked_at = time.monotonic()
+        self.run("queue", lambda: get_publisher().connect())
+
+        self.startup_seconds = round(time.perf_counter() - start, 3)
+
+    def refresh(self):
+        """
+        Check storage again if the last result is older than RECHECK_SECONDS.
+
+        A worker started before storage was up becomes ready once it is, and
+        one that loses storage later stops reporting ready.
+        """
+        if time.monotonic() - self.storage_checked_at < RECHECK_SECONDS:
+            return
+
+        # One check at a time, concurrent requests report the previous result
+        if not self.lock.acquire(blocking=False):
+            return
+
+        try:
+            self.run("storage", self.check_storage)
+            self.storage_checked_at = time.monotonic()
+        finally:
+            self.lock.release()
+
+    def report(self) -> dict:
+        return {
+            "status": "ready" if self.ready else "unavailable",
+            "startup_seconds": self.startup_seconds,
+            "checks": self.checks,
+        }
+
+
+readiness = Readiness()
@@ -1,27 +1,50 @@
 import asyncio
+import contextvars
 import threading
 import time
-from typing import Dict, List, Set
+from contextlib import nullcontext
+from typing import Dict, List, Optional, Sequence, Set
 from concurrent.futures import ThreadPoolExecutor
 
-import storage.zincsearch as zincsearch
+from storage.backend import StorageBackend, get_backend
+from controllers import metrics, profiling
+from models.file import FileIndex
 
 BUSY_WAIT_SECONDS = 1
+# Short poll used while a file is still being read, batches arrive continuously
+POLL_SECONDS = 0.01
 
 class AsyncBatchProcessor:
-    def __init__(self, batch_size: int, timeout: float, index_name: str, num_workers: int = 4):
+    def __init__(
+        self,
+        batch_size: int,
+        timeout: float,
+        index_name: str,
+        num_workers: int = 4,
+        bulk_semaphore=None,
+        backend: Optional[StorageBackend] = None,
+        max_pending_batches: Optional[int] = None,
+    ):
         self.batch_size = batch_size
         self.timeout = timeout
         self.index_name = index_name
         self.num_workers = num_workers
+        # Optional semaphore shared with other processors (or processes) to cap bulk concurrency
+        self.bulk_semaphore = bulk_semaphore
+        self.backend = backend or get_backend()
         self.thread_pool = ThreadPoolExecutor(max_workers=num_workers)
 
+        # Sealed batches allowed to wait for a worker before add_record blocks,
+        # so only a bounded part of the file is held in memory
+        self.max_pending_batches = max_pending_batches or num_workers * 2
+
         # Dictionary to store batches: key -> list of records
         self.batches: Dict[int, List[dict]] = {}
         self.current_index = 0  # Points to current batch being filled
-        self.raw_pending_keys: Set[int] = set()  # Pool of keys ready to be processed
-        self.pending_keys: List[Set[int]] = list()  # Pool of keys ready to be processed
+        self.pending_keys: List[Set[int]] = [set() for _ in range(num_workers)]  # Keys ready to be processed, per worker
 
+        self.workers: List[asyncio.Task] = []
+        self.timeout_checker: Optional[asyncio.Task] = None
         self.running = True
         self.stop_event = asyncio.Event()
         self.timeout_event = asyncio.Event()
@@ -36,25 +59,60 @@ class AsyncBatchProcessor:
 
         # If current batch is full or it's the last record, add to pending keys and move to next index
         if len(self.batches[self.current_index]) >= self.batch_size or is_last:
-            self.raw_pending_keys.add(self.current_index)
-            self.current_index += 1
+            self.seal_current_batch()
 
             if is_last:
                 self.stop_event.set()
+            else:
+                await self.wait_for_capacity()
+
+    def seal_current_batch(self):
+        """Hand the batch being filled to a worker and move to the next index"""
+        metrics.BATCH_RECORDS.observe(len(self.batches[self.current_index]))
+        metrics.PENDING_BATCHES.inc()
+
+        self.start_workers()
+        self.pending_keys[self.current_index % self.num_workers].add(self.current_index)
+        self.current_index += 1
+
+    async def wait_for_capacity(self):
+        """Block the producer while too many sealed batches are waiting to be inserted"""
+        while len(self.batches) > self.max_pending_batches:
+            # Workers that stopped (timeout or failed insert) won't free anything, stop() reports it
+            if self.timeout_event.is_set() or any(w.done() for w in self.workers):
+                return
+            await asyncio.sleep(POLL_SECONDS)
+
+    def start_workers(self):
+        """Start inserting as soon as the first batch is sealed instead of after the whole file is read"""
+        if self.workers:
+            return
+
+        self.workers = [
+            asyncio.create_task(self.worker(i))
+            for i in range(self.num_workers)
+        ]
+        self.timeout_checker = asyncio.create_task(self.check_timeout())
 
     def process_batch_threaded(self, worker_id: int, batch_index: int):
         """Thread-based batch processing"""
         start_time = time.time()
+        metrics.PENDING_BATCHES.dec()
+        metrics.INFLIGHT_BATCHES.inc()
         try:
             batch = self.batches[batch_index]
-            zincsearch.bulk_insert(self.index_name, batch)
+            with self.bulk_semaphore or nullcontext():
+                with metrics.BULK_INSERT_SECONDS.time(), profiling.span("bulk"):
+                    self.backend.bulk_insert(self.index_name, batch)
 
             self.pending_keys[worker_id].discard(batch_index)
             del self.batches[batch_index]
         except Exception as e:
+            metrics.BULK_INSERT_FAILURES.inc()
             print(f"Error processing batch {batch_index}: {str(e)}")
             raise
         finally:
+            metrics.INFLIGHT_BATCHES.dec()
             print(f"Batch {batch_index} inserted in {time.time() - start_time} seconds by worker {worker_id}")
 
     async def worker(self, worker_id: int):
@@ -66,23 +124,23 @@ class AsyncBatchProcessor:
                 print(f"Timeout reached, stopping worker {worker_id}")
                 break
 
-            if self.stop_event.is_set() and len(self.pending_keys)-1 < worker_id:
-                break
-
             if self.stop_event.is_set() and not self.pending_keys[worker_id]:
                 break
 
             start_time = time.time()
 
             if not self.pending_keys[worker_id]:
-                await asyncio.sleep(BUSY_WAIT_SECONDS)
+                await asyncio.sleep(POLL_SECONDS)
                 continue
 
             batch_index = self.pending_keys[worker_id].pop()
 
-            # Execute batch processing in thread pool
+            # Execute batch processing in thread pool, carrying the request
+            # context so stage tracing also covers the worker threads
+            context = contextvars.copy_context()
             await loop.run_in_executor(
                 self.thread_pool,
+                context.run,
                 self.process_batch_threaded,
                 worker_id,
                 batch_index
@@ -91,39 +149,30 @@ class AsyncBatchProcessor:
             print(f"Worker {worker_id} finished in {time.time() - start_time} seconds")
 
     async def start(self):
-        print("original size of raw pending keys", len(self.raw_pending_keys))
-
         print("worker groups size", self.num_workers)
 
-        for i in range(len(self.raw_pending_keys)):
-            worker_index = i % self.num_workers
-
-            if worker_index+1 > len(self.pending_keys):
-                self.pending_keys.append(set())
-
-            self.pending_keys[worker_index].add(self.raw_pending_keys.pop())
-
-        if len(self.raw_pending_keys) > 0:
-            self.pending_keys[self.num_workers-1].update(self.raw_pending_keys)
-
-        print("size of raw pending keys", len(self.raw_pending_keys))
-        print("final size of pending keys", len(self.pending_keys))
-
-        workers = [
-            asyncio.create_task(self.worker(i))
-            for i in range(self.num_workers)
-        ]
-
-        timeout_checker = asyncio.create_task(self.check_timeout())
+        self.start_workers()
 
         await self.stop_event.wait()
 
-        while self.batches:
+        # Stop waiting once every worker has exited, otherwise a failed batch
+        # that is never deleted would keep us here forever
+        while self.batches and not all(w.done() for w in self.workers):
             await asyncio.sleep(BUSY_WAIT_SECONDS)
 
         self.running = False
-        await asyncio.gather(*workers)
-        timeout_checker.cancel()
+        try:
+            await asyncio.gather(*self.workers)
+        finally:
+            self.timeout_checker.cancel()
+            # Batches left behind by a timeout or a failed worker are no longer pending
+            metrics.PENDING_BATCHES.dec(sum(len(keys) for keys in self.pending_keys))
+
+        # Workers that stopped on the timeout exit normally, don't report a partial insert as done
+        if self.batches:
+            raise TimeoutError(
+                f"{len(self.batches)} batches were not inserted within the {self.timeout} seconds timeout"
+            )
 
     async def check_timeout(self):
         print("Starting timeout checker")
@@ -140,14 +189,73 @@ class AsyncBatchProcessor:
 
     async def stop(self):
         print("Stopping batch processor...")
+
+        # Flush the last, partially filled batch
+        if self.batches.get(self.current_index):
+            self.seal_current_batch()
+
         self.stop_event.set()
-        await self.start()  # This will process remaining batches
-        self.thread_pool.shutdown(wait=True)
+        try:
+            await self.start()  # This will process remaining batches
+        finally:
+            self.thread_pool.shutdown(wait=True)
         print("Batch processor stopped.")
 
+async def ingest_file(
+    file_index: FileIndex,
+    filename: str,
+    processor: AsyncBatchProcessor,
+    progress: bool = True,
+    observers: Sequence = (),
+) -> int:
+    """
+    Convert every variant of an opened VCF into a record and feed it to the processor.
+
+    Args:
+        file_index: File returned by models.file.load_file
+        filename: Name stored in the `filename` field of every record
+        processor: Batch processor the records are added to, stopped once the file is consumed
+        progress: Print a running count of processed records
+        observers: Objects with an `add(record)` method that see every record, like a SuggestBuilder
+
+    Returns:
+        int: Number of records processed
+
+    Raises:
+        TimeoutError: If the processor timed out before every record was inserted
+    """
+    count = 0
+    timed_out = False
+    tracer = profiling.current_tracer()
+
+    for variant in profiling.timed_iter(file_index._readable, "parse", tracer):
+        # Nothing will be inserted anymore, stop reading the file
+        if processor.timeout_event.is_set():
+            timed_out = True
+            break
+
+        count += 1
+        with profiling.span("convert", tracer):
+            record = file_index.to_record(variant, filename)
+        for observer in observers:
+            observer.add(record)
+        await processor.add_record(record)
+        metrics.VARIANTS_PARSED.inc()
+        if progress:
+            print(f"Processed {count} records", end="\r")
+
+    print(f"\nWaiting for batch processor to finish {filename}")
+    await processor.stop()
+    print(f"Batch processor finished {filename}")
+
+    if timed_out:
+        raise TimeoutError(f"Timeout reached after {count} records of {filename}")
+
+    return count
+
 async def insert_batch(index_name, records_batch):
     try:
-        zincsearch.bulk_insert(index_name, records_batch)
+        get_backend().bulk_insert(index_name, records_batch)
     except Exception as e:
         print(f"Error uploading batch: {str(e)}")
         raise
@@ -0,0 +1,68 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+# Latency buckets in seconds, from a fast local search up to a slow bulk insert
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BATCH_SIZE_BUCKETS = (1, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+UPLOAD_BYTES = Counter(
+    "adn_upload_bytes_total",
+    "Bytes received through VCF uploads",
+)
+
+VARIANTS_PARSED = Counter(
+    "adn_variants_parsed_total",
+    "Variant records parsed from VCF files",
+)
+
+BATCH_RECORDS = Histogram(
+    "adn_batch_records",
+    "Number of records per bulk insert batch",
+    buckets=BATCH_SIZE_BUCKETS,
+)
+
+BULK_INSERT_SECONDS = Histogram(
+    "adn_bulk_insert_seconds",
+    "Latency of bulk inserts into the search backend",
+    buckets=LATENCY_BUCKETS,
+)
+
+BULK_INSERT_FAILURES = Counter(
+    "adn_bulk_insert_failures_total",
+    "Bulk inserts that raised an error",
+)
+
+PENDING_BATCHES = Gauge(
+    "adn_pending_batches",
+    "Batches filled and waiting for a worker",
+    multiprocess_mode="livesum",
+)
+
+INFLIGHT_BATCHES = Gauge(
+    "adn_inflight_batches",
+    "Batches currently being inserted",
+    multiprocess_mode="livesum",
+)
+
+QUERY_SECONDS = Histogram(
+    "adn_query_seconds",
+    "Latency of /api/query searches by query shape",
+    ["shape"],
+    buckets=LATENCY_BUCKETS,
+)
+
+EMAIL_PUBLISH_SECONDS = Histogram(
+    "adn_email_publish_seconds",
+    "Latency of publishing OTP emails to RabbitMQ",
+    buckets=LATENCY_BUCKETS,
+)
+
+
+def query_shape(filename: bool, search_term: bool) -> str:
+    """Label used to split query latency by the kind of query sent to the backend"""
+    if filename and search_term:
+        return "filename_search"
+    if search_term:
+        return "search"
+    if filename:
+        return "filename"
+    return "match_all"
@@ -0,0 +1,222 @@
+import contextvars
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Dict, Optional
+
+PROFILE_DIR = Path(tempfile.gettempdir()) / "adn_profiles"
+MAX_STORED_PROFILES = 50
+SAMPLING_INTERVAL_SECONDS = 0.001
+
+PROFILE_FORMATS = {
+    "html": ".html",
+    "speedscope": ".speedscope.json",
+}
+TRUTHY_VALUES = {"1", "true", "yes", "on"}
+
+_current_tracer: contextvars.ContextVar[Optional["StageTracer"]] = contextvars.ContextVar(
+    "stage_tracer", default=None
+)
+_NULL_SPAN = nullcontext()
+
+
+class Span:
+    __slots__ = ("tracer", "name", "start")
+
+    def __init__(self, tracer: "StageTracer", name: str):
+        self.tracer = tracer
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, time.perf_counter() - self.start)
+
+
+class StageTracer:
+    """Aggregates stage timings recorded from the event loop and worker threads"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started_at = time.perf_counter()
+        self.stages: Dict[str, dict] = {}
+
+    def span(self, name: str) -> Span:
+        return Span(self, name)
+
+    def record(self, name: str, seconds: float):
+        thread_name = threading.current_thread().name
+
+        with self.lock:
+            stage = self.stages.get(name)
+            if stage is None:
+                stage = self.stages[name] = {"count": 0, "total": 0.0, "max": 0.0, "threads": set()}
+
+            stage["count"] += 1
+            stage["total"] += seconds
+            stage["max"] = max(stage["max"], seconds)
+            stage["threads"].add(thread_name)
+
+    def summary(self) -> dict:
+        with self.lock:
+            stages = {
+                name: {
+                    "count": stage["count"],
+                    "total_ms": round(stage["total"] * 1000, 3),
+                    "max_ms": round(stage["max"] * 1000, 3),
+                    "threads": len(stage["threads"]),
+                }
+                for name, stage in self.stages.items()
+            }
+
+        return {
+            "wall_ms": round((time.perf_counter() - self.started_at) * 1000, 3),
+            "stages": stages,
+        }
+
+
+def current_tracer() -> Optional[StageTracer]:
+    return _current_tracer.get()
+
+
+def span(name: str, tracer: Optional[StageTracer] = None):
+    """
+    Time a block as stage `name` of the current request, a no-op when tracing is off.
+
+    Code running in executor threads only sees the tracer when it is called
+    through a copied context (`contextvars.copy_context().run`) or given the tracer.
+    """
+    tracer = tracer or _current_tracer.get()
+    if tracer is None:
+        return _NULL_SPAN
+
+    return tracer.span(name)
+
+
+def requested_format(header_value: Optional[str], query_value: Optional[str]) -> Optional[str]:
+    """Profile format asked for by the X-Profile header or the profile query flag, if any"""
+    for value in (header_value, query_value):
+        if not value:
+            continue
+
+        value = value.strip().lower()
+        if value in PROFILE_FORMATS:
+            return value
+        if value in TRUTHY_VALUES:
+            return "html"
+
+    return None
+
+
+class RequestProfile:
+    """Sampling profile plus stage tracing for a single request"""
+
+    def __init__(self, profile_format: str):
+        self.profile_format = profile_format
+        self.profile_id = uuid.uuid4().hex
+        self.tracer = StageTracer()
+        self.profiler = None
+        self.artifact: Optional[Path] = None
+        self._token = None
+
+    def __enter__(self) -> "RequestProfile":
+        self._token = _current_tracer.set(self.tracer)
+
+        # pyinstrument is only imported by profiled requests so starting the API doesn't pay for it
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            return self
+
+        self.profiler = Profiler(interval=SAMPLING_INTERVAL_SECONDS, async_mode="enabled")
+        self.profiler.start()
+
+        return self
+
+    def __exit__(self, *exc):
+        _current_tracer.reset(self._token)
+
+        if self.profiler is not None:
+            self.profiler.stop()
+            self.artifact = self.save()
+
+    def save(self) -> Path:
+        from pyinstrument.renderers import HTMLRenderer, SpeedscopeRenderer
+
+        PROFILE_DIR.mkdir(exist_ok=True)
+
+        if self.profile_format == "speedscope":
+            content = self.profiler.output(SpeedscopeRenderer())
+        else:
+            content = self.profiler.output(HTMLRenderer())
+
+        path = PROFILE_DIR / f"{self.profile_id}{PROFILE_FORMATS[self.profile_format]}"
+        path.write_text(content)
+
+        prune_profiles()
+
+        return path
+
+    def report(self) -> dict:
+        report = {"id": self.profile_id, **self.tracer.summary()}
+
+        if self.artifact is not None:
+            report["download_url"] = f"/api/profiles/{self.profile_id}"
+        else:
+            report["error"] = "pyinstrument is not installed, only stage timings are available"
+
+        return report
+
+
+def request_profile(profile_format: Optional[str]):
+    """Context manager yielding a RequestProfile, or None when profiling was not requested"""
+    if profile_format is None:
+        return nullcontext()
+
+    return RequestProfile(profile_format)
+
+
+def find_profile(profile_id: str) -> Optional[Path]:
+    # Ids are uuid4 hex strings, anything else could escape PROFILE_DIR
+    if len(profile_id) != 32 or not all(c in "0123456789abcdef" for c in profile_id):
+        return None
+
+    for suffix in PROFILE_FORMATS.values():
+        path = PROFILE_DIR / f"{profile_id}{suffix}"
+        if path.exists():
+            return path
+
+    return None
+
+
+def prune_profiles():
+    profiles = sorted(PROFILE_DIR.iterdir(), key=lambda p: p.stat().st_mtime, reverse=True)
+    for path in profiles[MAX_STORED_PROFILES:]:
+        path.unlink(missing_ok=True)
+
+
+def timed_iter(iterable, name: str, tracer: Optional[StageTracer] = None):
+    """Record the time spent producing every item of `iterable` as stage `name`"""
+    if tracer is None:
+        return iterable
+
+    def generator():
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                tracer.record(name, time.perf_counter() - start)
+
+            yield item
+
+    return generator()
@@ -0,0 +1,265 @@
+import heapq
+import json
+import os
+import tempfile
+import threading
+from bisect import bisect_left
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote, unquote
+
+SUGGEST_DIR = Path(os.getenv("SUGGEST_DIR", Path(tempfile.gettempdir()) / "adn_suggest"))
+
+KINDS = ("rsid", "gene", "info_key", "filter")
+MAX_SUGGESTIONS = 10
+# Prefix ranges up to this size are ranked on request, larger ones are precomputed
+SCAN_LIMIT = 256
+LAST_CHAR = chr(0x10FFFF)
+
+# INFO keys holding gene symbols, ANN is the SnpEff annotation with the gene as 4th field
+GENE_INFO_KEYS = ("GENE", "GENEINFO", "ANN")
+
+
+def parse_genes(key: str, value: str) -> List[str]:
+    if key == "ANN":
+        genes = []
+        for annotation in value.split(","):
+            fields = annotation.split("|")
+            if len(fields) > 3 and fields[3]:
+                genes.append(fields[3])
+        return genes
+
+    if key == "GENEINFO":
+        # SYMBOL:GENE_ID|SYMBOL:GENE_ID
+        return [gene.split(":")[0] for gene in value.split("|") if gene]
+
+    return [gene for gene in value.split(",") if gene]
+
+
+class SuggestBuilder:
+    """Counts suggestion terms while a file is ingested, see SuggestIndex"""
+
+    def __init__(self):
+        self.counters: Dict[str, Counter] = {kind: Counter() for kind in KINDS}
+
+    def add(self, record: dict):
+        rsids = self.counters["rsid"]
+        for variant_id in record.get("ID", "").split(";"):
+            if variant_id.startswith("rs"):
+                rsids[variant_id] += 1
+
+        filters = self.counters["filter"]
+        for value in record.get("FILTER", "").split(";"):
+            if value and value != ".":
+                filters[value] += 1
+
+        info = record.get("INFO", "")
+        if not info or info == ".":
+            return
+
+        info_keys = self.counters["info_key"]
+        genes = self.counters["gene"]
+        for entry in info.split(";"):
+            key, _, value = entry.partition("=")
+            info_keys[key] += 1
+
+            if value and key in GENE_INFO_KEYS:
+                for gene in set(parse_genes(key, value)):
+                    genes[gene] += 1
+
+    def build(self) -> "SuggestIndex":
+        return SuggestIndex({kind: dict(counter) for kind, counter in self.counters.items()})
+
+
+class SortedTerms:
+    """Terms of one kind sorted case-insensitively, with top terms precomputed for broad prefixes"""
+
+    def __init__(self, counts: Dict[str, int]):
+        items = sorted(counts.items(), key=lambda item: (item[0].lower(), item[0]))
+
+        self.terms = [term for term, _ in items]
+        self.keys = [term.lower() for term in self.terms]
+        self.counts = [count for _, count in items]
+        self.top: Dict[str, List[int]] = {}
+
+        self.precompute("", 0, len(self.keys))
+
+    def rank(self, positions) -> List[int]:
+        return heapq.nsmallest(
+            MAX_SUGGESTIONS, positions, key=lambda i: (-self.counts[i], self.keys[i])
+        )
+
+    def precompute(self, prefix: str, lo: int, hi: int) -> List[int]:
+        if hi - lo <= SCAN_LIMIT:
+            return self.rank(range(lo, hi))
+
+        # Merge the top terms of every child prefix instead of scanning the whole range
+        candidates = []
+        i = lo
+        while i < hi and self.keys[i] == prefix:
+            candidates.append(i)
+            i += 1
+
+        depth = len(prefix)
+        while i < hi:
+            child = prefix + self.keys[i][depth]
+            j = bisect_left(self.keys, child + LAST_CHAR, i, hi)
+            candidates.extend(self.precompute(child, i, j))
+            i = j
+
+        top = self.rank(candidates)
+        self.top[prefix] = top
+
+        return top
+
+    def lookup(self, prefix: str) -> List[Tuple[str, int]]:
+        prefix = prefix.lower()
+
+        positions = self.top.get(prefix)
+        if positions is None:
+            lo = bisect_left(self.keys, prefix)
+            hi = bisect_left(self.keys, prefix + LAST_CHAR, lo)
+            positions = self.rank(range(lo, hi))
+
+        return [(self.terms[i], self.counts[i]) for i in positions]
+
+
+class SuggestIndex:
+    """Per-file suggestion terms (rsIDs, gene symbols, INFO keys and FILTER values) with their frequencies"""
+
+    def __init__(self, counts: Dict[str, Dict[str, int]]):
+        self.counts = counts
+        self.terms = {kind: SortedTerms(counts.get(kind, {})) for kind in KINDS}
+
+    def lookup(self, prefix: str, kind: Optional[str] = None) -> List[dict]:
+        kinds = [kind] if kind else KINDS
+
+        return [
+            {"term": term, "kind": k, "count": count}
+            for k in kinds
+            for term, count in self.terms[k].lookup(prefix)
+        ]
+
+    def save(self, path: Path):
+        # Write then rename, so other processes never load a half written index
+        with tempfile.NamedTemporaryFile("w", dir=path.parent, suffix=".tmp", delete=False) as handle:
+            handle.write(json.dumps(self.counts))
+        os.replace(handle.name, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "SuggestIndex":
+        return cls(json.loads(path.read_text()))
+
+
+class SuggestRegistry:
+    """
+    In-memory suggestion indexes by filename.
+
+    Indexes are also written to SUGGEST_DIR so ones built by other processes,
+    like the bulk ingestion CLI or other workers, are loaded on first use. The
+    file's mtime is checked before serving a cached index, so re-ingests and
+    deletions done elsewhere are picked up.
+    """
+
+    def __init__(self, directory: Path = SUGGEST_DIR):
+        self.directory = directory
+        # filename -> (index, mtime of its file or None when it isn't persisted)
+        self.indexes: Dict[str, Tuple[SuggestIndex, Optional[int]]] = {}
+        self.lock = threading.Lock()
+        # Filenames found in the directory, listed again when its mtime changes
+        self.listing: List[str] = []
+        self.listing_mtime: Optional[int] = None
+
+    def path_for(self, filename: str) -> Path:
+        return self.directory / f"{quote(filename, safe='')}.json"
+
+    def register(self, filename: str, index: SuggestIndex, persist: bool = True):
+        mtime = None
+        if persist:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self.path_for(filename)
+            index.save(path)
+            mtime = path.stat().st_mtime_ns
+
+        with self.lock:
+            self.indexes[filename] = (index, mtime)
+
+    def get(self, filename: str) -> Optional[SuggestIndex]:
+        cached = self.indexes.get(filename)
+        if cached is not None and cached[1] is None:
+            return cached[0]
+
+        try:
+            mtime = self.path_for(filename).stat().st_mtime_ns
+        except FileNotFoundError:
+            # Deleted, possibly by another process
+            with self.lock:
+                self.indexes.pop(filename, None)
+            return None
+
+        if cached is not None and cached[1] == mtime:
+            return cached[0]
+
+        index = SuggestIndex.load(self.path_for(filename))
+        with self.lock:
+            self.indexes[filename] = (index, mtime)
+
+        return index
+
+    def filenames(self) -> List[str]:
+        names = {name for name, (_, mtime) in self.indexes.items() if mtime is None}
+
+        try:
+            mtime = self.directory.stat().st_mtime_ns
+        except FileNotFoundError:
+            return sorted(names)
+
+        # Creating, replacing or deleting an index changes the directory mtime
+        if mtime != self.listing_mtime:
+            self.listing = [unquote(path.name[:-len(".json")]) for path in self.directory.glob("*.json")]
+            self.listing_mtime = mtime
+
+            # Forget indexes whose file was deleted elsewhere
+            listed = set(self.listing)
+            with self.lock:
+                for name in [n for n, (_, m) in self.indexes.items() if m is not None and n not in listed]:
+                    del self.indexes[name]
+
+        return sorted(names.union(self.listing))
+
+    def suggest(
+        self,
+        prefix: str,
+        filename: Optional[str] = None,
+        kind: Optional[str] = None,
+        limit: int = MAX_SUGGESTIONS,
+    ) -> List[dict]:
+        filenames = [filename] if filename else self.filenames()
+
+        # Add up the frequencies of terms found in several files
+        merged: Dict[Tuple[str, str], int] = {}
+        for name in filenames:
+            index = self.get(name)
+            if index is None:
+                continue
+
+            for suggestion in index.lookup(prefix, kind):
+                key = (suggestion["kind"], suggestion["term"])
+                merged[key] = merged.get(key, 0) + suggestion["count"]
+
+        ranked = sorted(merged.items(), key=lambda item: (-item[1], item[0][1].lower()))
+
+        return [
+            {"term": term, "kind": kind, "count": count}
+            for (kind, term), count in ranked[:limit]
+        ]
+
+    def remove(self, filename: str):
+        with self.lock:
+            self.indexes.pop(filename, None)
+
+        self.path_for(filename).unlink(missing_ok=True)
+
+
+suggestions = SuggestRegistry()
@@ -0,0 +1,78 @@
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+# bgzip and BCF inputs benefit from htslib decompression threads, plain text does not
+COMPRESSED_SUFFIXES = (".gz", ".bgz", ".bcf")
+
+MAX_DECOMPRESSION_THREADS = 8
+MAX_WORKER_THREADS = 5
+
+
+def available_cpus() -> int:
+    override = os.getenv("INGEST_CPU_COUNT")
+    if override:
+        return max(1, int(override))
+
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+
+    return os.cpu_count() or 1
+
+
+def is_compressed(path: Union[str, Path]) -> bool:
+    return str(path).lower().endswith(COMPRESSED_SUFFIXES)
+
+
+class ThreadAllocation:
+    def __init__(self, decompression: int, workers: int):
+        self.decompression = decompression
+        self.workers = workers
+
+    def __repr__(self) -> str:
+        return f"ThreadAllocation(decompression={self.decompression}, workers={self.workers})"
+
+
+class ThreadBudget:
+    """
+    Process-wide budget that splits the available cores between concurrent ingests.
+
+    Every ingest reserves its share when it starts, based on how many ingests are
+    active at that moment. htslib threads cannot be resized once a file is open,
+    so earlier ingests keep their share until they finish.
+    """
+
+    def __init__(self, cpu_count: Optional[int] = None):
+        self.cpu_count = cpu_count or available_cpus()
+        self.active = 0
+        self.lock = threading.Lock()
+
+    def allocate(self, path: Union[str, Path], active: int) -> ThreadAllocation:
+        share = max(1, self.cpu_count // max(1, active))
+
+        decompression = 0
+        if is_compressed(path):
+            # Leave at least half of the share for conversion and bulk workers, but
+            # always ask for one: htslib fails to open BGZF/BCF files with 0 threads
+            decompression = max(1, min(MAX_DECOMPRESSION_THREADS, share // 2))
+
+        workers = max(1, min(MAX_WORKER_THREADS, share - decompression))
+
+        return ThreadAllocation(decompression=decompression, workers=workers)
+
+    @contextmanager
+    def reserve(self, path: Union[str, Path]) -> Iterator[ThreadAllocation]:
+        with self.lock:
+            self.active += 1
+            allocation = self.allocate(path, self.active)
+
+        try:
+            yield allocation
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+budget = ThreadBudget()
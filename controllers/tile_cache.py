@@ -0,0 +1,178 @@
+import asyncio
+import json
+import os
+from collections import OrderedDict
+from typing import Dict, Set, Tuple
+
+from storage.backend import get_backend
+
+TILE_SIZE = int(os.getenv("TILE_SIZE", "10000"))
+MAX_TILE_RECORDS = 1000
+PREFETCH_RADIUS = int(os.getenv("TILE_PREFETCH_RADIUS", "1"))
+MAX_CACHE_BYTES = int(os.getenv("TILE_CACHE_MAX_MB", "64")) * 1024 * 1024
+
+# (index name, filename, chromosome, position bin)
+TileKey = Tuple[str, str, str, int]
+
+
+class TileCache:
+    """
+    LRU cache of genome browser tiles, the variants of a file in a position bin.
+
+    Serving a tile prefetches its neighbours in the background, so panning along
+    a chromosome is answered from memory. The cache is bounded by the JSON size
+    of the tiles it holds and must only be used from the event loop.
+
+    Every process has its own cache, invalidated by the ingests and deletions it
+    handles. Files re-ingested by another worker or ingest.py can be served from
+    stale tiles until they are evicted.
+    """
+
+    def __init__(
+        self,
+        tile_size: int = TILE_SIZE,
+        max_bytes: int = MAX_CACHE_BYTES,
+        prefetch_radius: int = PREFETCH_RADIUS,
+        max_records: int = MAX_TILE_RECORDS,
+    ):
+        self.tile_size = tile_size
+        self.max_bytes = max_bytes
+        self.prefetch_radius = prefetch_radius
+        self.max_records = max_records
+
+        self.tiles: "OrderedDict[TileKey, Tuple[dict, int]]" = OrderedDict()
+        self.size_bytes = 0
+        self.inflight: Dict[TileKey, asyncio.Task] = {}
+        self.prefetches: Set[asyncio.Task] = set()
+        # Bumped on invalidation so fetches started before a re-ingest are not cached
+        self.generations: Dict[str, int] = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, index_name: str, filename: str, chrom: str, bin_index: int) -> dict:
+        key = (index_name, filename, chrom, bin_index)
+
+        tile = await self.get_or_fetch(key)
+        self.prefetch_neighbours(key)
+
+        return tile
+
+    async def get_or_fetch(self, key: TileKey) -> dict:
+        cached = self.tiles.get(key)
+        if cached is not None:
+            self.hits += 1
+            self.tiles.move_to_end(key)
+            return cached[0]
+
+        self.misses += 1
+
+        # Shield so a cancelled request doesn't cancel a fetch other requests wait on
+        return await asyncio.shield(self.start_fetch(key))
+
+    def start_fetch(self, key: TileKey) -> asyncio.Task:
+        task = self.inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self.fetch(key))
+            self.inflight[key] = task
+
+        return task
+
+    async def fetch(self, key: TileKey) -> dict:
+        index_name, filename, chrom, bin_index = key
+        generation = self.generations.get(filename, 0)
+        start = bin_index * self.tile_size
+
+        try:
+            results = await asyncio.to_thread(
+                get_backend().search_region,
+                index_name,
+                filename,
+                chrom,
+                start,
+                start + self.tile_size - 1,
+                self.max_records,
+            )
+
+            records = results.get("hits", {}).get("hits", [])
+            total = results.get("hits", {}).get("total", {}).get("value", 0)
+            tile = {
+                "filename": filename,
+                "chrom": chrom,
+                "bin": bin_index,
+                "start": start,
+                "end": start + self.tile_size - 1,
+                "total": total,
+                "truncated": total > len(records),
+                "records": records,
+            }
+
+            if self.generations.get(filename, 0) == generation:
+                self.store(key, tile)
+
+            return tile
+        finally:
+            # invalidate() may already have replaced this fetch with a newer one
+            if self.inflight.get(key) is asyncio.current_task():
+                del self.inflight[key]
+
+    def prefetch_neighbours(self, key: TileKey):
+        index_name, filename, chrom, bin_index = key
+
+        for distance in range(1, self.prefetch_radius + 1):
+            for neighbour in (bin_index - distance, bin_index + distance):
+                neighbour_key = (index_name, filename, chrom, neighbour)
+                if neighbour < 0 or neighbour_key in self.tiles or neighbour_key in self.inflight:
+                    continue
+
+                task = self.start_fetch(neighbour_key)
+                self.prefetches.add(task)
+                task.add_done_callback(self.prefetch_done)
+
+    def prefetch_done(self, task: asyncio.Task):
+        self.prefetches.discard(task)
+
+        # Prefetch failures are not reported to anyone, the next request retries
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Tile prefetch failed: {task.exception()}")
+
+    def store(self, key: TileKey, tile: dict):
+        size = len(json.dumps(tile))
+        if size > self.max_bytes:
+            return
+
+        previous = self.tiles.pop(key, None)
+        if previous is not None:
+            self.size_bytes -= previous[1]
+
+        self.tiles[key] = (tile, size)
+        self.size_bytes += size
+
+        while self.size_bytes > self.max_bytes:
+            _, (_, evicted_size) = self.tiles.popitem(last=False)
+            self.size_bytes -= evicted_size
+
+    def invalidate(self, filename: str):
+        """Drop every tile of a file, called when it is re-ingested or deleted"""
+        self.generations[filename] = self.generations.get(filename, 0) + 1
+
+        for key in [k for k in self.tiles if k[1] == filename]:
+            _, size = self.tiles.pop(key)
+            self.size_bytes -= size
+
+        # Fetches still running read the old records, later requests start their own
+        for key in [k for k in self.inflight if k[1] == filename]:
+            del self.inflight[key]
+
+    def stats(self) -> dict:
+        return {
+            "tiles": len(self.tiles),
+            "bytes": self.size_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "inflight": len(self.inflight),
+        }
+
+
+tile_cache = TileCache()
@@ -0,0 +1,225 @@
+import argparse
+import asyncio
+import glob
+import json
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from controllers import compare, thread_budget
+from controllers.index_file import AsyncBatchProcessor, ingest_file
+from controllers.suggest import SuggestBuilder, suggestions
+from models.file import load_file, parse_names
+from storage.backend import get_backend
+
+VCF_SUFFIXES = (".vcf", ".vcf.gz", ".bcf")
+DEFAULT_INDEX_NAME = "vcf_index_delete_me"
+BUFFER_SIZE = 1000
+
+# Set in every pool process so all of them share the same bulk concurrency limit
+_bulk_semaphore = None
+
+
+def is_vcf(path: Path) -> bool:
+    return path.is_file() and path.name.endswith(VCF_SUFFIXES)
+
+
+def expand_inputs(inputs: List[str]) -> List[Tuple[str, Path]]:
+    """
+    Resolve directories (recursively) and glob patterns into a sorted list of VCF files.
+
+    Returns:
+        (filename, path) pairs, the filename stored with the records is the path relative
+        to the directory given, or the basename for files matched by a pattern
+
+    Raises:
+        ValueError: If two different files would be stored under the same filename
+    """
+    files: Dict[str, Path] = {}
+
+    def add(name: str, path: Path):
+        previous = files.setdefault(name, path)
+        if previous.resolve() != path.resolve():
+            raise ValueError(f"{previous} and {path} would both be ingested as {name}")
+
+    for value in inputs:
+        root = Path(value)
+
+        if root.is_dir():
+            for path in root.rglob("*"):
+                if is_vcf(path):
+                    add(path.relative_to(root).as_posix(), path)
+            continue
+
+        for match in glob.glob(value, recursive=True):
+            path = Path(match)
+            if is_vcf(path):
+                add(path.name, path)
+
+    return sorted(files.items())
+
+
+def init_worker(bulk_semaphore, cpu_count: int):
+    global _bulk_semaphore
+    _bulk_semaphore = bulk_semaphore
+
+    # Every pool process gets an equal slice of the machine for its own budget
+    thread_budget.budget = thread_budget.ThreadBudget(cpu_count)
+
+    # The batch processor reports progress with print, keep stdout for the JSON summary
+    sys.stdout = sys.stderr
+
+
+async def ingest_path(
+    path: Path,
+    filename: str,
+    index_name: str,
+    timeout: float,
+    samples: Optional[List[str]] = None,
+    columns: Optional[List[str]] = None,
+) -> int:
+    with thread_budget.budget.reserve(path) as threads:
+        # Files are read in place, no temporary copy like the HTTP upload needs
+        file_index = load_file(
+            str(path), threads=threads.decompression, samples=samples, columns=columns
+        )
+
+        get_backend().create_mapping(index_name, file_index.column_names())
+
+        processor = AsyncBatchProcessor(
+            batch_size=BUFFER_SIZE,
+            timeout=timeout,
+            index_name=index_name,
+            num_workers=threads.workers,
+            bulk_semaphore=_bulk_semaphore,
+        )
+
+        suggest_builder = SuggestBuilder()
+        key_writer = compare.KeyWriter(filename)
+        try:
+            count = await ingest_file(
+                file_index,
+                filename,
+                processor,
+                progress=False,
+                observers=[suggest_builder, key_writer],
+            )
+        except Exception:
+            key_writer.abort()
+            raise
+
+        key_writer.close()
+
+        # Written to SUGGEST_DIR, the API server picks it up on first use
+        suggestions.register(filename, suggest_builder.build())
+
+        return count
+
+
+def run_file(
+    path: Path,
+    filename: str,
+    index_name: str,
+    timeout: float,
+    samples: Optional[List[str]] = None,
+    columns: Optional[List[str]] = None,
+) -> dict:
+    start = time.time()
+    try:
+        count = asyncio.run(ingest_path(path, filename, index_name, timeout, samples, columns))
+        return {
+            "path": str(path),
+            "filename": filename,
+            "status": "completed",
+            "records_processed": count,
+            "seconds": round(time.time() - start, 3),
+        }
+    except Exception as e:
+        return {
+            "path": str(path),
+            "filename": filename,
+            "status": "failed",
+            "error": str(e),
+            "seconds": round(time.time() - start, 3),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk ingest VCF files already on this machine")
+    parser.add_argument("inputs", nargs="+", help="Directories or glob patterns of .vcf, .vcf.gz or .bcf files")
+    parser.add_argument("--index", default=DEFAULT_INDEX_NAME, help="Index to insert the records into")
+    parser.add_argument("--jobs", type=int, default=thread_budget.available_cpus(), help="Files ingested in parallel")
+    parser.add_argument("--max-bulk", type=int, default=8, help="Bulk inserts in flight across all files")
+    parser.add_argument("--timeout", type=float, default=60 * 120, help="Seconds allowed per file")
+    parser.add_argument("--samples", help="Comma separated samples to ingest, empty for none, all by default")
+    parser.add_argument(
+        "--columns",
+        help="Comma separated columns to keep besides CHROM, POS, ID, REF, ALT, FILTER and INFO, all by default",
+    )
+    parser.add_argument("--output", help="Also write the JSON summary to this file")
+
+    args = parser.parse_args()
+
+    try:
+        files = expand_inputs(args.inputs)
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        sys.exit(1)
+
+    if not files:
+        print("No VCF files found", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"Ingesting {len(files)} files with {min(args.jobs, len(files))} processes", file=sys.stderr)
+
+    start = time.time()
+    bulk_semaphore = multiprocessing.BoundedSemaphore(args.max_bulk)
+    jobs = min(args.jobs, len(files))
+    cpu_count = max(1, thread_budget.available_cpus() // jobs)
+    results = []
+
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=init_worker,
+        initargs=(bulk_semaphore, cpu_count),
+    ) as pool:
+        futures = [
+            pool.submit(
+                run_file,
+                path,
+                filename,
+                args.index,
+                args.timeout,
+                parse_names(args.samples),
+                parse_names(args.columns),
+            )
+            for filename, path in files
+        ]
+
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            print(f"{result['status']}: {result['path']}", file=sys.stderr)
+
+    failed = [r for r in results if r["status"] != "completed"]
+    summary = json.dumps({
+        "files": len(results),
+        "failed": len(failed),
+        "records_processed": sum(r.get("records_processed", 0) for r in results),
+        "seconds": round(time.time() - start, 3),
+        "results": sorted(results, key=lambda r: r["path"]),
+    }, indent=2)
+    print(summary)
+
+    if args.output:
+        Path(args.output).write_text(summary + "\n")
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,23 @@
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from routers import index_router
+from routers import health_router, index_router, metrics_router
 from fastapi.middleware.cors import CORSMiddleware
+from controllers.email import get_publisher
+from controllers.health import readiness
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     print('Server starting up...')
+    # Pay for connections and index checks before the first request does
+    await asyncio.to_thread(
+        readiness.warm_up,
+        [index_router.INGEST_INDEX_NAME, index_router.QUERY_INDEX_NAME],
+    )
+    print(f'Server ready in {readiness.startup_seconds} seconds: {readiness.report()["status"]}')
     yield
     print('Server shutting down...')
+    get_publisher().close()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -19,6 +29,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 app.include_router(index_router.router)
+app.include_router(metrics_router.router)
+app.include_router(health_router.router)
 
 @app.get("/")
 async def root():
@@ -1,13 +1,22 @@
-from cyvcf2 import VCF
 from pydantic import BaseModel, Field, PrivateAttr
-from typing import Dict, Optional, List
+from typing import Any, Dict, Optional, List, Tuple
 
 CHROM_COL_NAME = "#CHROM"
+POS_COL_NAME = "POS"
+FORMAT_COL_NAME = "FORMAT"
+
+# Columns always kept when columns are subset, search, tiles, suggestions and
+# comparisons depend on them
+REQUIRED_COLS = [CHROM_COL_NAME, POS_COL_NAME, "ID", "REF", "ALT", "FILTER", "INFO"]
 
 class FileIndex(BaseModel):
     by_name: Dict[str, int] = Field(alias="by_name")
     by_index: Dict[int, str] = Field(alias="by_index")
-    _readable: VCF = PrivateAttr(default=None)
+    # cyvcf2.VCF, typed as Any so importing this module doesn't load cyvcf2
+    _readable: Any = PrivateAttr(default=None)
+    # (index, name) of the columns put in records, None keeps every column
+    _kept: Optional[List[Tuple[int, str]]] = PrivateAttr(default=None)
+    _max_split: int = PrivateAttr(default=-1)
 
     class Config:
         arbitrary_types_allowed = True
@@ -39,13 +48,118 @@ class FileIndex(BaseModel):
     def __len__(self) -> int:
         return len(self.by_name)
 
+    def select_columns(self, columns: Optional[List[str]]) -> None:
+        """
+        Only keep the given columns, plus REQUIRED_COLS, in the records.
+
+        Args:
+            columns: Column names (e.g. QUAL, FORMAT or sample names), None keeps every column
+        """
+        if columns is None:
+            self._kept = None
+            self._max_split = -1
+            return
+
+        wanted = set(REQUIRED_COLS) | set(columns)
+
+        # Sample values can't be read without the FORMAT column describing them
+        format_idx = self.by_name.get(FORMAT_COL_NAME)
+        if format_idx is not None and any(self.by_name.get(name, -1) > format_idx for name in wanted):
+            wanted.add(FORMAT_COL_NAME)
+
+        self._kept = [(idx, name) for idx, name in self.by_index.items() if name in wanted]
+
+        # Stop splitting after the last kept column, the rest of the line is never used
+        self._max_split = max((idx for idx, _ in self._kept), default=0) + 1
+
+    def column_names(self) -> List[str]:
+        """Names of the columns put in records"""
+        if self._kept is None:
+            return list(self.by_name.keys())
+
+        return [name for _, name in self._kept]
+
+    def to_record(self, variant, filename: str) -> dict:
+        """Convert a cyvcf2 variant into a record keyed by column name"""
+        variant_slice = str(variant).strip().split('\t', self._max_split)
+
+        if self._kept is None:
+            record = {
+                self.by_index[col]: value
+                for col, value in enumerate(variant_slice)
+            }
+        else:
+            record = {
+                name: variant_slice[idx]
+                for idx, name in self._kept
+                if idx < len(variant_slice)
+            }
+        record["filename"] = filename
+
+        # Numeric position so backends can range query regions
+        if POS_COL_NAME in record:
+            record[POS_COL_NAME] = int(record[POS_COL_NAME])
 
-def load_file(path: str, threads: int = 10) -> FileIndex:
-    vcf = VCF(path, mode="r", lazy=True, threads=threads)
+        return record
+
+
+def parse_names(value: Optional[str]) -> Optional[List[str]]:
+    """Parse a comma separated list of sample or column names, None stays None and "" is an empty list"""
+    if value is None:
+        return None
+
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def load_file(
+    path: str,
+    threads: Optional[int] = None,
+    samples: Optional[List[str]] = None,
+    columns: Optional[List[str]] = None,
+) -> FileIndex:
+    """
+    Open a VCF/BCF file lazily.
+
+    Args:
+        path: Path of the .vcf, .vcf.gz or .bcf file
+        threads: htslib decompression threads, see controllers.thread_budget. None or 0 leaves
+            htslib's default, set_threads(0) is an error on bgzip and BCF files
+        samples: Samples to read, an empty list reads none and None reads all of them,
+            unless columns is given, then only the samples listed in columns are read
+        columns: Columns to keep in records besides REQUIRED_COLS, None keeps all of them
+    """
+    # cyvcf2 loads htslib, import it on first use instead of at startup
+    from cyvcf2 import VCF
+
+    vcf = VCF(
+        path,
+        mode="r",
+        lazy=True,
+        threads=threads or None,
+    )
+
+    if samples is None and columns is not None:
+        # Samples that won't be kept don't need to be unpacked either
+        samples = [name for name in vcf.samples if name in columns]
+
+    if samples is not None:
+        # htslib skips unpacking samples that are not requested, an empty list means none
+        vcf.set_samples(samples)
 
     header = next(line for line in reversed(vcf.raw_header.split('\n')) if line.startswith(CHROM_COL_NAME))
 
+    if samples is not None:
+        # The raw header still lists every sample, variants only hold the selected ones
+        header_columns = header.split('\t')
+        if FORMAT_COL_NAME in header_columns:
+            header_columns = header_columns[:header_columns.index(FORMAT_COL_NAME) + 1]
+        header = '\t'.join(header_columns + list(vcf.samples))
+
     file_index = FileIndex.from_header(header)
     file_index._readable = vcf
+    # Selected samples are kept even if they are not listed in columns
+    if columns is not None and samples:
+        columns = columns + [name for name in samples if name not in columns]
+    file_index.select_columns(columns)
 
     return file_index
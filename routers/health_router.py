@@ -0,0 +1,14 @@
+import asyncio
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from controllers.health import readiness
+
+router = APIRouter(tags=["health"])
+
+
+@router.get("/health")
+async def health():
+    await asyncio.to_thread(readiness.refresh)
+    return JSONResponse(readiness.report(), status_code=200 if readiness.ready else 503)
@@ -1,17 +1,26 @@
-from fastapi import APIRouter, UploadFile, File, Query, HTTPException
+from fastapi import APIRouter, UploadFile, File, Query, Header, HTTPException
+from fastapi.responses import FileResponse, StreamingResponse
 from typing import Optional
 import tempfile
 from pathlib import Path
 from datetime import datetime
-from models.file import load_file
-import storage.zincsearch as zincsearch
-from controllers.index_file import AsyncBatchProcessor
-from controllers.email import Publisher
+from models.file import load_file, parse_names
+from storage.backend import get_backend
+from controllers.index_file import AsyncBatchProcessor, ingest_file
+from controllers.email import get_publisher
+from controllers import compare, metrics, profiling, thread_budget
+from controllers.tile_cache import tile_cache
+from controllers.suggest import KINDS, MAX_SUGGESTIONS, SuggestBuilder, suggestions
+import asyncio
+import json
 import random
+import time
 from models.email import EmailRequest
 
 MEGABYTE_SIZE = 1024 * 1024
 BUFFER_SIZE = 1000
+INGEST_INDEX_NAME = "vcf_index_delete_me"
+QUERY_INDEX_NAME = "vcf_index"
 
 router = APIRouter(prefix="/api", tags=["indexing"])
 
@@ -19,67 +28,111 @@ router = APIRouter(prefix="/api", tags=["indexing"])
 @router.post("/index")
 async def index_file(
     file: UploadFile = File(...),
+    samples: Optional[str] = Query(
+        None, description="Comma separated samples to ingest, empty for none, all by default"
+    ),
+    columns: Optional[str] = Query(
+        None,
+        description="Comma separated columns to keep besides CHROM, POS, ID, REF, ALT, FILTER and INFO, all by default",
+    ),
+    profile: Optional[str] = Query(
+        None, description="Profile this request: true, html or speedscope"
+    ),
+    x_profile: Optional[str] = Header(None),
 ):
     now = datetime.now()
     try:
-        temp_dir = Path(tempfile.gettempdir()) / "adn_index_data"
-        temp_dir.mkdir(exist_ok=True)
-
-        original_extension = Path(file.filename).suffix
-        with tempfile.NamedTemporaryFile(
-            suffix=original_extension, dir=temp_dir
-        ) as temp_file:
-            temp_file_path = Path(temp_file.name)
-
-            # Save the file to the temporary directory
-            while chunk := await file.read(MEGABYTE_SIZE * 10):
-                temp_file.write(chunk)
-
-            file_index = load_file(temp_file_path)
-            index_name = "vcf_index_delete_me"
-
-            mapping_data = zincsearch.create_index_mapping_from_headers(
-                index_name, list(file_index.by_name.keys())
-            )
-
-            zincsearch.create_or_update_mapping(mapping_data)
-
-            count = 0
-            processor = AsyncBatchProcessor(
-                batch_size=BUFFER_SIZE,
-                timeout=60 * 120,
-                index_name=index_name,
-                num_workers=5,
-            )
-
-            for variant in file_index._readable:
-                count += 1
-                variant_slice = str(variant).strip().split("\t")
-                record = {
-                    file_index.by_index[col]: value
-                    for col, value in enumerate(variant_slice)
+        profile_format = profiling.requested_format(x_profile, profile)
+        with profiling.request_profile(profile_format) as session:
+            temp_dir = Path(tempfile.gettempdir()) / "adn_index_data"
+            temp_dir.mkdir(exist_ok=True)
+
+            original_extension = Path(file.filename).suffix
+            with tempfile.NamedTemporaryFile(
+                suffix=original_extension, dir=temp_dir
+            ) as temp_file:
+                temp_file_path = Path(temp_file.name)
+
+                # Save the file to the temporary directory
+                with profiling.span("upload"):
+                    while chunk := await file.read(MEGABYTE_SIZE * 10):
+                        temp_file.write(chunk)
+                        metrics.UPLOAD_BYTES.inc(len(chunk))
+
+                # Share the cores with any other ingest running in this process
+                with thread_budget.budget.reserve(temp_file_path) as threads:
+                    file_index = load_file(
+                        temp_file_path,
+                        threads=threads.decompression,
+                        samples=parse_names(samples),
+                        columns=parse_names(columns),
+                    )
+                    index_name = INGEST_INDEX_NAME
+
+                    # Columns dropped from the records are left out of the mapping too
+                    get_backend().create_mapping(index_name, file_index.column_names())
+
+                    processor = AsyncBatchProcessor(
+                        batch_size=BUFFER_SIZE,
+                        timeout=60 * 120,
+                        index_name=index_name,
+                        num_workers=threads.workers,
+                    )
+
+                    suggest_builder = SuggestBuilder()
+                    key_writer = compare.KeyWriter(file.filename)
+                    try:
+                        count = await ingest_file(
+                            file_index,
+                            file.filename,
+                            processor,
+                            observers=[suggest_builder, key_writer],
+                        )
+                    except Exception:
+                        key_writer.abort()
+                        raise
+
+                    key_writer.close()
+                    tile_cache.invalidate(file.filename)
+                    suggestions.register(file.filename, suggest_builder.build())
+
+                result = {
+                    "original_filename": file.filename,
+                    "temp_path": str(temp_file_path),
+                    "headers": file_index.by_name,
+                    "columns": file_index.column_names(),
+                    "status": "completed",
+                    "records_processed": count,
                 }
-                record["filename"] = file.filename
-                await processor.add_record(record)
-                print(f"Processed {count} records", end="\r")
-
-            print("\nWaiting for batch processor to finish")
-            await processor.stop()
-            print("Batch processor finished")
-
-            return {
-                "original_filename": file.filename,
-                "temp_path": str(temp_file_path),
-                "headers": file_index.by_name,
-                "status": "completed",
-                "records_processed": count,
-            }
+
+        if session is not None:
+            result["profile"] = session.report()
+
+        return result
     except Exception as e:
         return {"error": str(e)}
     finally:
         print(f"Total time: {datetime.now() - now}")
 
 
+@router.delete("/index")
+async def delete_file(
+    filename: str = Query(..., description="Filename whose records should be deleted"),
+):
+    try:
+        index_name = INGEST_INDEX_NAME
+
+        # Can take a while for large files, keep the event loop free
+        deleted = await asyncio.to_thread(get_backend().delete_by_file, index_name, filename)
+        tile_cache.invalidate(filename)
+        suggestions.remove(filename)
+        compare.remove_keys(filename)
+
+        return {"filename": filename, "records_deleted": deleted}
+    except Exception as e:
+        return {"error": str(e)}
+
+
 @router.get("/query")
 async def query_index(
     filename: Optional[str] = Query(None, description="Filter results by filename"),
@@ -88,6 +141,10 @@ async def query_index(
     ),
     page: int = Query(1, ge=1, description="Page number"),
     size: int = Query(10, ge=1, le=100, description="Number of records per page"),
+    profile: Optional[str] = Query(
+        None, description="Profile this request: true, html or speedscope"
+    ),
+    x_profile: Optional[str] = Header(None),
 ):
     """
     Query the indexed VCF records with pagination, filename filter, and search across indexed columns.
@@ -97,22 +154,27 @@ async def query_index(
         search: Optional search term to match across indexed columns (CHROM, FILTER, INFO, FORMAT)
         page: Page number (starts from 1)
         size: Number of records per page (1-100)
+        profile: Optional flag to profile the request, also accepted as the X-Profile header
 
     Returns:
         Dict containing search results and pagination metadata
     """
     try:
-        index_name = "vcf_index"
-
-        results = zincsearch.search_records(
-            index_name=index_name,
-            filename=filename,
-            search_term=search,
-            page=page,
-            size=size,
-        )
+        index_name = QUERY_INDEX_NAME
 
-        return {
+        shape = metrics.query_shape(bool(filename), bool(search))
+        profile_format = profiling.requested_format(x_profile, profile)
+        with profiling.request_profile(profile_format) as session:
+            with metrics.QUERY_SECONDS.labels(shape=shape).time(), profiling.span("search"):
+                results = get_backend().search(
+                    index_name=index_name,
+                    filename=filename,
+                    search_term=search,
+                    page=page,
+                    size=size,
+                )
+
+        response = {
             "total": results.get("hits", {}).get("total", {}).get("value", 0),
             "page": page,
             "size": size,
@@ -120,6 +182,102 @@ async def query_index(
             "took_ms": results.get("took", 0),
         }
 
+        if session is not None:
+            response["profile"] = session.report()
+
+        return response
+
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@router.get("/suggest")
+async def suggest(
+    prefix: str = Query(..., description="Text typed so far in the search box"),
+    filename: Optional[str] = Query(None, description="Only suggest terms from this file"),
+    kind: Optional[str] = Query(
+        None, description=f"Only suggest one kind of term: {', '.join(KINDS)}"
+    ),
+    limit: int = Query(MAX_SUGGESTIONS, ge=1, le=MAX_SUGGESTIONS, description="Number of suggestions"),
+):
+    """
+    Typeahead suggestions for the search box, answered from memory without querying the storage backend.
+
+    Args:
+        prefix: Case-insensitive prefix to complete
+        filename: Optional filename to restrict the suggestions to
+        kind: Optional kind of term (rsid, gene, info_key or filter)
+        limit: Number of suggestions (1-10)
+
+    Returns:
+        Dict containing the suggestions ranked by frequency
+    """
+    if kind is not None and kind not in KINDS:
+        raise HTTPException(status_code=422, detail=f"kind must be one of {', '.join(KINDS)}")
+
+    start = time.perf_counter()
+    results = suggestions.suggest(prefix, filename=filename, kind=kind, limit=limit)
+
+    return {
+        "prefix": prefix,
+        "suggestions": results,
+        "took_ms": round((time.perf_counter() - start) * 1000, 3),
+    }
+
+
+@router.get("/compare")
+async def compare_files(
+    a: str = Query(..., description="Filename of the first ingested file"),
+    b: str = Query(..., description="Filename of the second ingested file"),
+    op: str = Query(
+        "intersect", description=f"Comparison: {', '.join(compare.OPERATIONS)}"
+    ),
+):
+    """
+    Compare the variants (CHROM, POS, REF, ALT) of two ingested files.
+
+    The comparison is a streaming merge of the position sorted keys saved at
+    ingest, so memory use doesn't grow with the files. Results are streamed
+    as newline delimited JSON, the last line holds the summary counts.
+    """
+    if op not in compare.OPERATIONS:
+        raise HTTPException(
+            status_code=422, detail=f"op must be one of {', '.join(compare.OPERATIONS)}"
+        )
+
+    for filename in (a, b):
+        if not compare.has_keys(filename):
+            raise HTTPException(status_code=404, detail=f"No variant keys for {filename}, ingest it first")
+
+    def stream():
+        for row in compare.compare_files(a, b, op):
+            yield json.dumps(row) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@router.get("/tiles")
+async def query_tile(
+    filename: str = Query(..., description="File the variants were ingested from"),
+    chrom: str = Query(..., description="Chromosome, as written in the #CHROM column"),
+    bin: int = Query(..., ge=0, description="Position bin, covering [bin * tile_size, (bin + 1) * tile_size)"),
+):
+    """
+    Variants of a file in a position bin, for the genome browser.
+
+    Tiles are cached in memory and the neighbouring bins are prefetched, so
+    panning along a chromosome doesn't wait on the storage backend.
+
+    Returns:
+        Dict containing the tile records, its position range and the tile size
+    """
+    try:
+        # Same index /api/index ingests into, whose re-ingests and deletions invalidate the cache
+        index_name = INGEST_INDEX_NAME
+
+        tile = await tile_cache.get(index_name, filename, chrom, bin)
+
+        return {**tile, "tile_size": tile_cache.tile_size}
     except Exception as e:
         return {"error": str(e)}
 
@@ -131,8 +289,9 @@ async def generate_otp(email_request: EmailRequest):
 
         message = {"email": email_request.email, "otp": otp}
 
-        publisher = Publisher()
-        publisher.publish(message)
+        publisher = get_publisher()
+        with metrics.EMAIL_PUBLISH_SECONDS.time():
+            publisher.publish(message)
 
         return {
             "message": "OTP generated and email queued successfully",
@@ -143,3 +302,12 @@ async def generate_otp(email_request: EmailRequest):
     except Exception as e:
         print(f"Error publishing message: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/profiles/{profile_id}")
+async def download_profile(profile_id: str):
+    path = profiling.find_profile(profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    return FileResponse(path, filename=path.name)
@@ -0,0 +1,28 @@
+import os
+
+from fastapi import APIRouter, Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    generate_latest,
+    multiprocess,
+)
+
+router = APIRouter(tags=["metrics"])
+
+
+def get_registry():
+    # With several uvicorn workers every process writes its samples to
+    # PROMETHEUS_MULTIPROC_DIR and they are aggregated on scrape
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+
+    return REGISTRY
+
+
+@router.get("/metrics")
+async def metrics():
+    return Response(content=generate_latest(get_registry()), media_type=CONTENT_TYPE_LATEST)
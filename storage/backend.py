@@ -0,0 +1,81 @@
+import os
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+
+class StorageBackend(ABC):
+    """
+    Storage used to index and search VCF records.
+
+    Search results follow the ZincSearch/Elasticsearch response shape
+    (`took`, `hits.total.value`, `hits.hits[]._source`) whatever the backend.
+    """
+
+    @abstractmethod
+    def create_mapping(self, index_name: str, headers: List[str]) -> None:
+        """Create the index, or update its mapping, for a file with the given VCF columns"""
+
+    @abstractmethod
+    def ensure_index(self, index_name: str) -> None:
+        """Check the backend is reachable, a missing index is created by the first create_mapping"""
+
+    @abstractmethod
+    def bulk_insert(self, index_name: str, records: List[Dict]) -> Dict:
+        """Insert a batch of records, raising ValueError if it is empty"""
+
+    @abstractmethod
+    def search(
+        self,
+        index_name: str,
+        filename: Optional[str] = None,
+        search_term: Optional[str] = None,
+        page: int = 1,
+        size: int = 10,
+    ) -> Dict:
+        """Paginated search with an optional filename filter and search term"""
+
+    @abstractmethod
+    def search_region(
+        self,
+        index_name: str,
+        filename: str,
+        chrom: str,
+        start: int,
+        end: int,
+        size: int = 1000,
+    ) -> Dict:
+        """Records of a file with start <= POS <= end on a chromosome, sorted by position"""
+
+    @abstractmethod
+    def delete_by_file(self, index_name: str, filename: str) -> int:
+        """Delete every record ingested from `filename`, returning how many were removed"""
+
+
+_backend: Optional[StorageBackend] = None
+
+
+def create_backend(name: str) -> StorageBackend:
+    if name == "zincsearch":
+        from storage.zincsearch import ZincSearchBackend
+        return ZincSearchBackend()
+
+    if name == "sqlite":
+        from storage.sqlite import SQLiteBackend
+        return SQLiteBackend(os.getenv("SQLITE_PATH", "adn_browser.db"))
+
+    raise ValueError(f"Unknown storage backend: {name}")
+
+
+def get_backend() -> StorageBackend:
+    """Backend selected with the STORAGE_BACKEND environment variable (zincsearch or sqlite)"""
+    global _backend
+
+    if _backend is None:
+        _backend = create_backend(os.getenv("STORAGE_BACKEND", "zincsearch"))
+
+    return _backend
+
+
+def set_backend(backend: StorageBackend) -> None:
+    global _backend
+    _backend = backend
@@ -0,0 +1,216 @@
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+from controllers import profiling
+from storage.backend import StorageBackend
+
+# Same columns ZincSearch indexes for full text search
+FTS_COLUMNS = {
+    "#CHROM": "chrom",
+    "FILTER": "filter",
+    "INFO": "info",
+    "FORMAT": "format",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY,
+    index_name TEXT NOT NULL,
+    filename TEXT,
+    chrom TEXT,
+    pos INTEGER,
+    source TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS records_position ON records (index_name, filename, chrom, pos);
+CREATE VIRTUAL TABLE IF NOT EXISTS records_fts USING fts5(chrom, filter, info, format);
+"""
+
+
+def parse_position(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def fts_prefix_query(search_term: str) -> str:
+    """Prefix match for every token of the search term, quoted so FTS5 syntax is not interpreted"""
+    tokens = [t for t in search_term.split() if t]
+    return " ".join('"{}"*'.format(t.replace('"', '""')) for t in tokens)
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Embedded backend for single-user deployments and tests.
+
+    Records are stored as JSON next to a (index_name, filename, chrom, pos) index,
+    and CHROM/FILTER/INFO/FORMAT go to an FTS5 table for search. Search terms are
+    prefix matched per token, there is no wildcard or fuzzy matching like ZincSearch.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.local = threading.local()
+        self.schema_lock = threading.Lock()
+        self.schema_ready = False
+
+    def connection(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared across threads, the batch
+        # processor inserts from a thread pool so keep one per thread
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+
+        if not self.schema_ready:
+            with self.schema_lock:
+                if not self.schema_ready:
+                    conn.executescript(SCHEMA)
+                    self.schema_ready = True
+
+        return conn
+
+    def create_mapping(self, index_name: str, headers: List[str]) -> None:
+        # Records are stored schemaless, only make sure the tables exist
+        self.connection()
+
+    def ensure_index(self, index_name: str) -> None:
+        self.connection()
+
+    def bulk_insert(self, index_name: str, records: List[Dict]) -> Dict:
+        if not records:
+            raise ValueError("Records list cannot be empty")
+
+        conn = self.connection()
+
+        with profiling.span("serialize"):
+            rows = [
+                (
+                    index_name,
+                    record.get("filename"),
+                    record.get("#CHROM"),
+                    parse_position(record.get("POS")),
+                    json.dumps(record),
+                )
+                for record in records
+            ]
+
+        # One transaction per batch
+        with conn:
+            fts_rows = []
+            for row, record in zip(rows, records):
+                cursor = conn.execute(
+                    "INSERT INTO records (index_name, filename, chrom, pos, source) VALUES (?, ?, ?, ?, ?)",
+                    row,
+                )
+                fts_rows.append((cursor.lastrowid, *(record.get(col) for col in FTS_COLUMNS)))
+
+            conn.executemany(
+                "INSERT INTO records_fts (rowid, chrom, filter, info, format) VALUES (?, ?, ?, ?, ?)",
+                fts_rows,
+            )
+
+        return {"message": "v2 data inserted", "record_count": len(records)}
+
+    def search(
+        self,
+        index_name: str,
+        filename: Optional[str] = None,
+        search_term: Optional[str] = None,
+        page: int = 1,
+        size: int = 10,
+    ) -> Dict:
+        if page < 1:
+            raise ValueError("Page number must be greater than 0")
+        if size < 1:
+            raise ValueError("Page size must be greater than 0")
+
+        start = time.time()
+        conn = self.connection()
+
+        query = "FROM records r"
+        conditions = ["r.index_name = ?"]
+        params: list = [index_name]
+
+        match = fts_prefix_query(search_term) if search_term else ""
+        if match:
+            query += " JOIN records_fts f ON f.rowid = r.id"
+            conditions.append("records_fts MATCH ?")
+            params.append(match)
+
+        if filename:
+            conditions.append("r.filename = ?")
+            params.append(filename)
+
+        query += " WHERE " + " AND ".join(conditions)
+
+        total = conn.execute(f"SELECT COUNT(*) {query}", params).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT r.id, r.source {query} ORDER BY r.id LIMIT ? OFFSET ?",
+            params + [size, (page - 1) * size],
+        ).fetchall()
+
+        return {
+            "took": int((time.time() - start) * 1000),
+            "hits": {
+                "total": {"value": total},
+                "hits": [
+                    {"_index": index_name, "_id": str(row_id), "_source": json.loads(source)}
+                    for row_id, source in rows
+                ],
+            },
+        }
+
+    def search_region(
+        self,
+        index_name: str,
+        filename: str,
+        chrom: str,
+        start: int,
+        end: int,
+        size: int = 1000,
+    ) -> Dict:
+        started = time.time()
+        conn = self.connection()
+
+        # Served by the (index_name, filename, chrom, pos) index
+        query = "FROM records WHERE index_name = ? AND filename = ? AND chrom = ? AND pos BETWEEN ? AND ?"
+        params = [index_name, filename, chrom, start, end]
+
+        total = conn.execute(f"SELECT COUNT(*) {query}", params).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT id, source {query} ORDER BY pos LIMIT ?",
+            params + [size],
+        ).fetchall()
+
+        return {
+            "took": int((time.time() - started) * 1000),
+            "hits": {
+                "total": {"value": total},
+                "hits": [
+                    {"_index": index_name, "_id": str(row_id), "_source": json.loads(source)}
+                    for row_id, source in rows
+                ],
+            },
+        }
+
+    def delete_by_file(self, index_name: str, filename: str) -> int:
+        conn = self.connection()
+
+        with conn:
+            conn.execute(
+                "DELETE FROM records_fts WHERE rowid IN "
+                "(SELECT id FROM records WHERE index_name = ? AND filename = ?)",
+                (index_name, filename),
+            )
+            cursor = conn.execute(
+                "DELETE FROM records WHERE index_name = ? AND filename = ?",
+                (index_name, filename),
+            )
+
+        return cursor.rowcount
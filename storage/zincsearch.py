@@ -1,9 +1,16 @@
+import json
+import os
 import requests
 from typing import Dict, Optional, List
 import logging
+from contextlib import contextmanager
+from requests.adapters import HTTPAdapter
 from requests.sessions import Session
 
-BASE_ENDPOINT = "http://localhost:4080"
+from controllers import profiling
+from storage.backend import StorageBackend
+
+BASE_ENDPOINT = os.getenv("ZINC_BASE_URL", "http://localhost:4080")
 
 DEFAULT_HEADERS = {
     "Content-Type": "application/json",
@@ -11,10 +18,18 @@ DEFAULT_HEADERS = {
 }
 
 CHROM_COL_NAME = "#CHROM"
+POS_COL_NAME = "POS"
 FILTER_COL_NAME = "FILTER"
 INFO_COL_NAME = "INFO"
 FORMAT_COL_NAME = "FORMAT"
 
+# Connections kept open per host, enough for the batch processor workers of concurrent ingests
+POOL_SIZE = int(os.getenv("ZINC_POOL_SIZE", "32"))
+
+# (connect, read) timeouts in seconds, the short one is for the startup and /health checks
+REQUEST_TIMEOUT = (5, float(os.getenv("ZINC_TIMEOUT", "300")))
+CHECK_TIMEOUT = (5, float(os.getenv("ZINC_CHECK_TIMEOUT", "5")))
+
 INDEXABLE_COLS = [
     CHROM_COL_NAME,
     FILTER_COL_NAME,
@@ -24,6 +39,8 @@ INDEXABLE_COLS = [
 
 # Add a session object as a module-level variable
 _session = Session()
+_session.mount("http://", HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE))
+_session.mount("https://", HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE))
 
 def create_index_mapping_from_headers(index_name: str, headers: List[str]) -> dict:
     """
@@ -41,7 +58,15 @@ def create_index_mapping_from_headers(index_name: str, headers: List[str]) -> di
 
     for header in headers:
         # Special handling for known columns
-        if header in INDEXABLE_COLS:
+        if header == POS_COL_NAME:
+            # Position is numeric so genome browser regions can be range queried
+            properties[header] = {
+                "type": "numeric",
+                "index": True,
+                "store": False,
+                "sortable": True
+            }
+        elif header in INDEXABLE_COLS:
             if header == CHROM_COL_NAME:
                 # Chromosome should be keyword for exact matching
                 properties[header] = {
@@ -123,7 +148,8 @@ def create_or_update_mapping(
         url,
         json=mapping_data,
         auth=(username, password),
-        headers=DEFAULT_HEADERS
+        headers=DEFAULT_HEADERS,
+        timeout=REQUEST_TIMEOUT
     )
 
     try:
@@ -136,6 +162,69 @@ def create_or_update_mapping(
 
     return response.json()
 
+def get_index(
+    index_name: str,
+    username: str = "admin",
+    password: str = "admin",
+    base_url: Optional[str] = None
+) -> Optional[Dict]:
+    """
+    Get the settings and mappings of a ZincSearch index.
+
+    Args:
+        index_name: Name of the index
+        username: ZincSearch username (defaults to 'admin')
+        password: ZincSearch password (defaults to 'admin')
+        base_url: Optional custom base URL (defaults to BASE_ENDPOINT)
+
+    Returns:
+        Optional[Dict]: The index, or None if it doesn't exist
+
+    Raises:
+        requests.exceptions.RequestException: If the API request fails
+    """
+    url = f"{base_url or BASE_ENDPOINT}/api/index/{index_name}"
+
+    response = _session.get(
+        url,
+        auth=(username, password),
+        headers=DEFAULT_HEADERS,
+        timeout=CHECK_TIMEOUT
+    )
+
+    if response.status_code in (400, 404):
+        return None
+
+    response.raise_for_status()
+    return response.json()
+
+def index_exists(
+    index_name: str,
+    username: str = "admin",
+    password: str = "admin",
+    base_url: Optional[str] = None
+) -> bool:
+    """
+    Check whether a ZincSearch index exists.
+
+    Args:
+        index_name: Name of the index
+        username: ZincSearch username (defaults to 'admin')
+        password: ZincSearch password (defaults to 'admin')
+        base_url: Optional custom base URL (defaults to BASE_ENDPOINT)
+
+    Returns:
+        bool: True if the index exists
+
+    Raises:
+        requests.exceptions.RequestException: If the API request fails
+    """
+    return get_index(index_name, username, password, base_url) is not None
+
+def position_field_type(index: Dict) -> Optional[str]:
+    """Type POS is mapped as in an index returned by get_index, None if it isn't mapped yet"""
+    return index.get("mappings", {}).get("properties", {}).get(POS_COL_NAME, {}).get("type")
+
 def bulk_insert(
     index_name: str,
     records: List[Dict],
@@ -170,13 +259,19 @@ def bulk_insert(
         "records": records
     }
 
+    # Encode the payload ourselves so serialisation shows up as its own stage
+    with profiling.span("serialize"):
+        body = json.dumps(payload)
+
     # Use session here as well
-    response = _session.post(
-        url,
-        json=payload,
-        auth=(username, password),
-        headers=DEFAULT_HEADERS
-    )
+    with profiling.span("http"):
+        response = _session.post(
+            url,
+            data=body,
+            auth=(username, password),
+            headers=DEFAULT_HEADERS,
+            timeout=REQUEST_TIMEOUT
+        )
 
     response.raise_for_status()
 
@@ -278,8 +373,278 @@ def search_records(
         url,
         json=query,
         auth=(username, password),
-        headers=DEFAULT_HEADERS
+        headers=DEFAULT_HEADERS,
+        timeout=REQUEST_TIMEOUT
     )
 
     response.raise_for_status()
-    return response.json()
\ No newline at end of file
+    return response.json()
+
+def search_region(
+    index_name: str,
+    filename: str,
+    chrom: str,
+    start: int,
+    end: int,
+    size: int = 1000,
+    username: str = "admin",
+    password: str = "admin",
+    base_url: Optional[str] = None
+) -> Dict:
+    """
+    Search the records of a file within a chromosome region, sorted by position.
+
+    Args:
+        index_name: Name of the index to search in
+        filename: Filename the records were ingested from
+        chrom: Chromosome, matched exactly against the #CHROM column
+        start: First position of the region (inclusive)
+        end: Last position of the region (inclusive)
+        size: Maximum number of records to return (defaults to 1000)
+        username: ZincSearch username (defaults to 'admin')
+        password: ZincSearch password (defaults to 'admin')
+        base_url: Optional custom base URL (defaults to BASE_ENDPOINT)
+
+    Returns:
+        Dict: Response from the ZincSearch API containing search results and metadata
+    """
+    url = f"{base_url or BASE_ENDPOINT}/es/{index_name}/_search"
+
+    query = {
+        "from": 0,
+        "size": size,
+        "sort": [POS_COL_NAME],
+        "query": {
+            "bool": {
+                "must": [
+                    {"term": {"filename": filename}},
+                    {"term": {CHROM_COL_NAME: chrom}},
+                    {"range": {POS_COL_NAME: {"gte": start, "lte": end}}}
+                ]
+            }
+        }
+    }
+
+    response = _session.post(
+        url,
+        json=query,
+        auth=(username, password),
+        headers=DEFAULT_HEADERS,
+        timeout=REQUEST_TIMEOUT
+    )
+
+    response.raise_for_status()
+    return response.json()
+
+def delete_records_by_filename(
+    index_name: str,
+    filename: str,
+    username: str = "admin",
+    password: str = "admin",
+    base_url: Optional[str] = None,
+    page_size: int = 1000
+) -> int:
+    """
+    Delete every record of an index that was ingested from the given file.
+
+    Ids are listed page by page sorted by `_id`, then removed with one `_bulk`
+    request of delete actions per page.
+
+    Args:
+        index_name: Name of the index to delete from
+        filename: Value of the `filename` field of the records to delete
+        username: ZincSearch username (defaults to 'admin')
+        password: ZincSearch password (defaults to 'admin')
+        base_url: Optional custom base URL (defaults to BASE_ENDPOINT)
+        page_size: Number of ids fetched per search request and deleted per bulk request
+
+    Returns:
+        int: Number of deleted records
+
+    Raises:
+        requests.exceptions.RequestException: If the API request fails
+    """
+    search_url = f"{base_url or BASE_ENDPOINT}/es/{index_name}/_search"
+    bulk_url = f"{base_url or BASE_ENDPOINT}/api/_bulk"
+
+    # Collect every id first so deletions don't shift the pages being read,
+    # sorted so pages are stable between requests
+    ids = []
+    offset = 0
+    while True:
+        response = _session.post(
+            search_url,
+            json={
+                "from": offset,
+                "size": page_size,
+                "sort": ["_id"],
+                "_source": False,
+                "query": {"bool": {"must": [{"term": {"filename": filename}}]}}
+            },
+            auth=(username, password),
+            headers=DEFAULT_HEADERS,
+            timeout=REQUEST_TIMEOUT
+        )
+        response.raise_for_status()
+
+        hits = response.json().get("hits", {}).get("hits", [])
+        ids.extend(hit["_id"] for hit in hits)
+
+        if len(hits) < page_size:
+            break
+        offset += page_size
+
+    for i in range(0, len(ids), page_size):
+        body = "".join(
+            json.dumps({"delete": {"_index": index_name, "_id": doc_id}}) + "\n"
+            for doc_id in ids[i:i + page_size]
+        )
+        response = _session.post(
+            bulk_url,
+            data=body,
+            auth=(username, password),
+            headers=DEFAULT_HEADERS,
+            timeout=REQUEST_TIMEOUT
+        )
+        response.raise_for_status()
+
+    return len(ids)
+
+class ZincSearchBackend(StorageBackend):
+    def __init__(
+        self,
+        username: str = "admin",
+        password: str = "admin",
+        base_url: Optional[str] = None
+    ):
+        self.username = username
+        self.password = password
+        self.base_url = base_url
+        # Indexes known to exist, ZincSearch rejects the mapping PUT for them anyway
+        self.known_indexes = set()
+        # Indexes checked to map POS as numeric, see check_region_mapping
+        self.region_indexes = set()
+
+    def forget(self, index_name: str) -> None:
+        """Drop what is cached about an index, it was deleted or has to be checked again"""
+        self.known_indexes.discard(index_name)
+        self.region_indexes.discard(index_name)
+
+    @contextmanager
+    def forget_if_missing(self, index_name: str):
+        try:
+            yield
+        except requests.exceptions.HTTPError as e:
+            if e.response is not None and e.response.status_code in (400, 404):
+                self.forget(index_name)
+            raise
+
+    def create_mapping(self, index_name: str, headers: List[str]) -> None:
+        # Checked on every ingest, not only once per process: the index may have been
+        # deleted to reindex it, and _bulkv2 would recreate it with dynamic mappings
+        if index_name in self.known_indexes:
+            if index_exists(index_name, self.username, self.password, self.base_url):
+                return
+            self.forget(index_name)
+
+        mapping_data = create_index_mapping_from_headers(index_name, headers)
+        response = create_or_update_mapping(
+            mapping_data, self.username, self.password, self.base_url
+        )
+        self.known_indexes.add(index_name)
+
+        if "error" in response:
+            # The index already existed, its mapping was left as is
+            self.warn_if_not_region_ready(index_name)
+
+    def ensure_index(self, index_name: str) -> None:
+        # A missing index is left to the first ingest, whose mapping lists the file's
+        # sample columns as not indexed. Creating it here with the fixed columns only
+        # would leave those to ZincSearch's dynamic mapping, which indexes them.
+        if index_exists(index_name, self.username, self.password, self.base_url):
+            self.known_indexes.add(index_name)
+            self.warn_if_not_region_ready(index_name)
+
+    def check_region_mapping(self, index_name: str) -> None:
+        """
+        Make sure POS can be range queried in an index.
+
+        ZincSearch can't change the type of a mapped field, indexes created before POS
+        was mapped as numeric keep it as unindexed text and have to be reindexed
+        (deleted and their files ingested again) for region queries to match anything.
+
+        Raises:
+            ValueError: If POS is mapped with another type than numeric
+        """
+        if index_name in self.region_indexes:
+            return
+
+        index = get_index(index_name, self.username, self.password, self.base_url)
+        field_type = position_field_type(index) if index else None
+
+        if field_type is None:
+            # Missing index or nothing ingested yet, there is nothing to find either way
+            return
+
+        if field_type != "numeric":
+            raise ValueError(
+                f"Index {index_name} maps {POS_COL_NAME} as {field_type}, region queries need it numeric. "
+                f"Delete the index and ingest its files again"
+            )
+
+        self.region_indexes.add(index_name)
+
+    def warn_if_not_region_ready(self, index_name: str) -> None:
+        try:
+            self.check_region_mapping(index_name)
+        except ValueError as e:
+            logging.warning(str(e))
+
+    def bulk_insert(self, index_name: str, records: List[Dict]) -> Dict:
+        with self.forget_if_missing(index_name):
+            return bulk_insert(
+                index_name, records, self.username, self.password, self.base_url
+            )
+
+    def search(
+        self,
+        index_name: str,
+        filename: Optional[str] = None,
+        search_term: Optional[str] = None,
+        page: int = 1,
+        size: int = 10
+    ) -> Dict:
+        with self.forget_if_missing(index_name):
+            return search_records(
+                index_name=index_name,
+                filename=filename,
+                search_term=search_term,
+                page=page,
+                size=size,
+                username=self.username,
+                password=self.password,
+                base_url=self.base_url
+            )
+
+    def search_region(
+        self,
+        index_name: str,
+        filename: str,
+        chrom: str,
+        start: int,
+        end: int,
+        size: int = 1000
+    ) -> Dict:
+        self.check_region_mapping(index_name)
+
+        with self.forget_if_missing(index_name):
+            return search_region(
+                index_name, filename, chrom, start, end, size,
+                self.username, self.password, self.base_url
+            )
+
+    def delete_by_file(self, index_name: str, filename: str) -> int:
+        with self.forget_if_missing(index_name):
+            return delete_records_by_filename(
+                index_name, filename, self.username, self.password, self.base_url
+            )